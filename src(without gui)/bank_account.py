@@ -1,5 +1,18 @@
-from typing import List
+import datetime
+import math
+import threading
+from typing import Iterator, List, Optional, Tuple
+import velocity
+from fx import convert_amount
+from instrumentation import timed
+from locks import lock_accounts
 from transaction import Transaction
+from transaction_store import TransactionStore
+
+
+def valid_amount(amount: float) -> bool:
+    """True for a finite amount above zero; NaN fails every comparison"""
+    return math.isfinite(amount) and amount > 0
 
 
 class BankAccount:
@@ -8,68 +21,158 @@ class BankAccount:
         self.user_id = user_id
         self.balance = 0.0
         self.currency = currency
-        self.transactions: List[Transaction] = []
+        self.transactions = TransactionStore()
+        # Guards balance and transactions; see locks.lock_accounts
+        self.lock = threading.RLock()
 
+    @timed("account.deposit")
     def deposit(self, amount: float) -> bool:
         """Add funds to account"""
-        if amount <= 0:
+        if not valid_amount(amount):
             print("Amount must be positive")
             return False
 
-        self.balance += amount
-        transaction = Transaction("deposit", amount, self.account_number)
-        self.transactions.append(transaction)
+        with self.lock:
+            self.balance += amount
+            transaction = Transaction("deposit", amount, self.account_number)
+            self.transactions.append(transaction)
         return True
 
+    @timed("account.withdraw")
     def withdraw(self, amount: float) -> bool:
         """Remove funds from account"""
-        if amount <= 0:
+        if not valid_amount(amount):
             print("Amount must be positive")
             return False
 
-        if amount > self.balance:
-            print("Insufficient funds")
-            return False
-
-        self.balance -= amount
-        transaction = Transaction("withdraw", amount, self.account_number)
-        self.transactions.append(transaction)
+        # Check and debit under one lock so concurrent withdrawals cannot
+        # both pass the balance check
+        with self.lock:
+            if amount > self.balance:
+                print("Insufficient funds")
+                return False
+            limit = velocity.check(self, "withdraw", amount)
+            if limit:
+                print(f"Limit exceeded: {limit}")
+                return False
+
+            self.balance -= amount
+            transaction = Transaction("withdraw", amount, self.account_number)
+            self.transactions.append(transaction)
+            velocity.record(self, "withdraw", amount, transaction.timestamp)
         return True
 
-    def transfer(self, to_account: "BankAccount", amount: float) -> bool:
-        """Transfer funds to another account"""
-        if amount <= 0:
+    @timed("account.transfer")
+    def transfer(
+        self, to_account: "BankAccount", amount: float, rate: Optional[float] = None
+    ) -> bool:
+        """Transfer funds to another account; rate converts amount into the
+        recipient's currency and is required when the currencies differ
+        """
+        if not valid_amount(amount):
             print("Amount must be positive")
             return False
-
-        if amount > self.balance:
-            print("Insufficient funds for transfer")
+        if rate is None:
+            if to_account.currency != self.currency:
+                print(f"No exchange rate from {self.currency} to {to_account.currency}")
+                return False
+            rate = 1.0
+        credited = convert_amount(amount, rate)
+        if credited <= 0:
+            print("Amount is too small to convert")
             return False
 
-        # Create withdraw transaction for this account
-        self.balance -= amount
-        out_transaction = Transaction(
-            "transfer", amount, self.account_number, to_account.account_number
-        )
-        self.transactions.append(out_transaction)
-
-        # Create deposit transaction for recipient account
-        to_account.balance += amount
-        in_transaction = Transaction(
-            "transfer", amount, self.account_number, to_account.account_number
-        )
-        to_account.transactions.append(in_transaction)
+        with lock_accounts(self, to_account):
+            if amount > self.balance:
+                print("Insufficient funds for transfer")
+                return False
+            limit = velocity.check(self, "transfer", amount)
+            if limit:
+                print(f"Limit exceeded: {limit}")
+                return False
+
+            # Create withdraw transaction for this account
+            self.balance -= amount
+            out_transaction = Transaction(
+                "transfer", amount, self.account_number, to_account.account_number
+            )
+            self.transactions.append(out_transaction)
+            velocity.record(self, "transfer", amount, out_transaction.timestamp)
+
+            # Create deposit transaction for recipient account
+            to_account.balance += credited
+            in_transaction = Transaction(
+                "transfer", credited, self.account_number, to_account.account_number
+            )
+            to_account.transactions.append(in_transaction)
 
         return True
 
+    @timed("account.get_statement")
     def get_statement(self) -> List[str]:
         """Return formatted transaction history"""
         if not self.transactions:
             return ["No transactions found"]
 
-        # Sort transactions by timestamp
-        sorted_transactions = sorted(self.transactions, key=lambda t: t.timestamp)
-        return [str(transaction) for transaction in sorted_transactions]
+        return list(self.iter_statement())
+
+    def iter_statement(
+        self,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+        newest_first: bool = False,
+    ) -> Iterator[str]:
+        """Yield formatted transactions with start <= timestamp < end"""
+        with self.lock:
+            lo, hi = self.transactions.time_range(start, end)
+        for transaction in self.transactions.in_time_order(lo, hi, newest_first):
+            yield str(transaction)
+
+    @timed("account.get_statement_page")
+    def get_statement_page(
+        self,
+        limit: int = 20,
+        cursor: Optional[int] = None,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+    ) -> Tuple[List[str], Optional[int]]:
+        """Return one page of history, newest first, and the next cursor.
+
+        Pass the returned cursor back to get the next (older) page; it is
+        None once there are no older transactions in the range.
+        """
+        with self.lock:
+            lo, hi = self.transactions.time_range(start, end)
+            if cursor is not None:
+                hi = max(lo, min(hi, cursor))
+            page_lo = max(lo, hi - limit)
+            lines = [
+                str(transaction)
+                for transaction in self.transactions.in_time_order(
+                    page_lo, hi, reverse=True
+                )
+            ]
+        return lines, (page_lo if page_lo > lo else None)
+
+    def balance_as_of(self, when: datetime.datetime) -> float:
+        """Balance at a past moment, i.e. after every transaction before when"""
+        with self.lock:
+            store = self.transactions
+            _, position = store.time_range(None, when)
+            if position == len(store):
+                return self.balance
+            later = store.net_change_before(
+                len(store), self.account_number
+            ) - store.net_change_before(position, self.account_number)
+            return self.balance - later
+
+    def copy(self) -> "BankAccount":
+        """Return a point-in-time copy of the account"""
+        account = BankAccount(self.account_number, self.user_id, self.currency)
+        with self.lock:
+            account.balance = self.balance
+            account.transactions = self.transactions.copy()
+        return account
 
     def to_dict(self) -> dict:
         """Convert account to dictionary for persistence"""
@@ -78,7 +181,7 @@ class BankAccount:
             "user_id": self.user_id,
             "balance": self.balance,
             "currency": self.currency,
-            "transactions": [t.to_dict() for t in self.transactions],
+            "transactions": self.transactions.to_dicts(),
         }
 
     @classmethod
@@ -90,5 +193,5 @@ class BankAccount:
             currency=data["currency"],
         )
         account.balance = data["balance"]
-        account.transactions = [Transaction.from_dict(t) for t in data["transactions"]]
+        account.transactions = TransactionStore.from_dicts(data["transactions"])
         return account
\ No newline at end of file
@@ -1,23 +1,134 @@
+import datetime
 import json
-import os
-from typing import Dict, Optional
+import sqlite3
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 
+import batch
+import snapshot
+import velocity
+from fx import RateTable, convert_amount
+from idempotency import IdempotencyCache, scope_key
 from user import User
-from bank_account import BankAccount
+from bank_account import BankAccount, valid_amount
+from batch import BatchResult
+from instrumentation import timed
+from journal import Journal
+from lazy_accounts import LazyAccountMap
+from locks import SharedLock, lock_accounts
+from scheduler import Scheduler, StandingOrder
+from sessions import SessionManager
+from storage import FileStorage, Storage
+from transaction import Transaction
+from writer import GroupCommitWriter
 
 
 class BankSystem:
-    def __init__(self, data_file: str = "bank_data.json"):
+    def __init__(
+        self,
+        data_file: str = "bank_data.json",
+        journal: bool = False,
+        fsync_policy: str = "always",
+        snapshot_format: str = "json",
+        compact_every: int = 0,
+        lazy: bool = False,
+        max_resident_accounts: int = 1024,
+        write_behind: bool = False,
+        commit_interval: float = 1.0,
+        commit_threshold: int = 100,
+        storage: Optional[Storage] = None,
+        session_idle_timeout: float = 15 * 60,
+        session_absolute_timeout: float = 8 * 60 * 60,
+        max_sessions: int = 10000,
+        fx_rates: Optional[RateTable] = None,
+        idempotency_ttl: float = 24 * 60 * 60,
+        max_idempotency_keys: int = 100_000,
+        catch_up: str = "all",
+    ):
         self.users: Dict[int, User] = {}
         self.accounts: Dict[str, BankAccount] = {}
         self.data_file = data_file
         self.next_user_id = 1
         self.next_account_number = 10000
 
+        # Secondary indexes, kept in step with users and accounts
+        self.users_by_phone: Dict[str, User] = {}
+        self.accounts_by_user: Dict[int, List[str]] = {}
+        self.accounts_by_currency: Dict[str, List[str]] = {}
+
+        # Journaled mode appends one record per mutation instead of
+        # rewriting the whole data file
+        self.journal = (
+            Journal(data_file + ".journal", fsync_policy) if journal else None
+        )
+        self.journal_seq = 0
+
+        # Snapshots are written as "json" or compact "binary"; in journaled
+        # mode a background compaction runs every compact_every records
+        self.snapshot_format = snapshot_format
+        self.compact_every = compact_every
+        self._records_since_compact = 0
+        self._compaction: Optional[threading.Thread] = None
+
+        # Lazy mode maps a binary snapshot and decodes accounts on first use
+        self.lazy = lazy
+        self.max_resident_accounts = max_resident_accounts
+        if lazy:
+            self.snapshot_format = "binary"
+
+        # Full snapshots go to data_file unless another backend is given; an
+        # incremental backend persists each mutation itself
+        self.storage = storage or FileStorage(data_file, self.snapshot_format)
+        if self.storage.incremental and (journal or lazy or write_behind):
+            raise ValueError(
+                "An incremental storage backend cannot be combined with "
+                "journal, lazy or write_behind"
+            )
+        if lazy and not isinstance(self.storage, FileStorage):
+            raise ValueError("Lazy mode needs a single binary snapshot file")
+
+        # Mutations hold the locks of the accounts they touch plus the gate
+        # in shared mode; snapshots take the gate exclusively so they never
+        # see a change that is applied but not yet journaled
+        self._gate = SharedLock()
+        self._registry_lock = threading.Lock()
+        self._persist_lock = threading.Lock()
+        self._compaction_lock = threading.Lock()
+        self._compact_due = False
+
+        # Without a journal, write_behind hands snapshot writes to a
+        # background thread that commits changes in groups
+        if write_behind and journal:
+            raise ValueError("write_behind cannot be combined with journal")
+        self._writer = (
+            GroupCommitWriter(self._group_commit, commit_interval, commit_threshold)
+            if write_behind
+            else None
+        )
+
+        # Tokens issued by open_session; in memory only
+        self.sessions = SessionManager(
+            session_idle_timeout, session_absolute_timeout, max_sessions
+        )
+
+        # Cached exchange rates for transfers between currencies
+        self.fx_rates = fx_rates
+
+        # Results of keyed deposits, withdrawals and transfers, so a retried
+        # request is answered without being applied twice
+        self.idempotency = IdempotencyCache(idempotency_ttl, max_idempotency_keys)
+
+        # Standing orders; run_due executes the due ones as one batch
+        self.scheduler = Scheduler(catch_up)
+        self._tick_lock = threading.Lock()
+
         # Load data if file exists
-        if os.path.exists(data_file):
+        if self.storage.exists() or (self.journal and self.journal.exists()):
             self.load_from_file()
 
+    @timed("bank.register_user")
     def register_user(
         self, full_name: str, phone: str, password: str
     ) -> Optional[User]:
@@ -27,16 +138,22 @@ class BankSystem:
             print("Phone number already registered")
             return None
 
-        # Create new user
-        user_id = self.next_user_id
-        self.next_user_id += 1
+        # Hash before taking any lock; the KDF is deliberately slow
+        user = User(0, full_name, phone, password)
+        with self._mutation(), self._registry_lock:
+            if self.find_user_by_phone(phone):
+                print("Phone number already registered")
+                return None
 
-        user = User(user_id, full_name, phone, password)
-        self.users[user_id] = user
-        self.save_to_file()
+            # Create new user
+            user.user_id = self.next_user_id
+            self.next_user_id += 1
+            self._add_user(user)
+            self._persist({"op": "user", "user": user.to_dict()})
 
         return user
 
+    @timed("bank.login")
     def login(self, phone: str, password: str) -> Optional[User]:
         """Authenticate user and return User object if successful"""
         user = self.find_user_by_phone(phone)
@@ -44,70 +161,744 @@ class BankSystem:
             print("User not found")
             return None
 
+        old_hash = user.password
         if user.authenticate(password):
+            if user.password != old_hash:
+                # Persist the upgraded hash
+                with self._mutation(), self._registry_lock:
+                    self._persist({"op": "user", "user": user.to_dict()})
             return user
         else:
             # Authentication failed but handled in authenticate method
+            if user.is_locked():
+                self.sessions.invalidate_user(user.user_id)
+            return None
+
+    def open_session(self, phone: str, password: str) -> Optional[str]:
+        """Log in and return a session token for later requests"""
+        user = self.login(phone, password)
+        if not user:
             return None
+        return self.sessions.create(user.user_id)
 
+    def session_user(self, token: Optional[str]) -> Optional[User]:
+        """Return the user of a live session without re-authenticating"""
+        user_id = self.sessions.validate(token)
+        if user_id is None:
+            return None
+        user = self.users.get(user_id)
+        if user is None or user.is_locked():
+            self.sessions.invalidate_user(user_id)
+            return None
+        return user
+
+    def logout(self, token: Optional[str]) -> bool:
+        """End a session"""
+        return self.sessions.invalidate(token)
+
+    @timed("bank.create_account")
     def create_account(self, user: User, currency: str = "USD") -> BankAccount:
         """Create a new bank account for a user"""
-        account_number = str(self.next_account_number)
-        self.next_account_number += 1
+        with self._mutation(), self._registry_lock:
+            account_number = str(self.next_account_number)
+            self.next_account_number += 1
 
-        account = BankAccount(account_number, user.user_id, currency)
-        self.accounts[account_number] = account
-        user.add_account(account_number)
+            account = BankAccount(account_number, user.user_id, currency)
+            self._add_account(account)
+            user.add_account(account_number)
 
-        self.save_to_file()
+            self._persist({"op": "account", "account": account.to_dict()})
         return account
 
+    @timed("bank.deposit")
+    def deposit(
+        self,
+        account: BankAccount,
+        amount: float,
+        idempotency_key: Optional[str] = None,
+    ) -> bool:
+        """Deposit into an account and persist the change.
+
+        A repeated idempotency_key returns the first call's result instead
+        of depositing again; the same applies to withdraw and transfer. Keys
+        are scoped to the operation and the account money leaves or enters.
+        """
+        idempotency_key = scope_key(idempotency_key, "deposit", account.account_number)
+        with self._mutation(account):
+            previous = self.idempotency.get(idempotency_key)
+            if previous is not None:
+                return previous
+            if not account.deposit(amount):
+                return self._remember(idempotency_key, False)
+            self._mark_dirty(account)
+            self._record_transactions(account, idempotency_key=idempotency_key)
+        return True
+
+    @timed("bank.withdraw")
+    def withdraw(
+        self,
+        account: BankAccount,
+        amount: float,
+        idempotency_key: Optional[str] = None,
+    ) -> bool:
+        """Withdraw from an account and persist the change"""
+        idempotency_key = scope_key(idempotency_key, "withdraw", account.account_number)
+        with self._mutation(account):
+            previous = self.idempotency.get(idempotency_key)
+            if previous is not None:
+                return previous
+            if not account.withdraw(amount):
+                return self._remember(idempotency_key, False)
+            self._mark_dirty(account)
+            self._record_transactions(account, idempotency_key=idempotency_key)
+        return True
+
+    @timed("bank.transfer")
+    def transfer(
+        self,
+        from_account: BankAccount,
+        to_account: BankAccount,
+        amount: float,
+        idempotency_key: Optional[str] = None,
+    ) -> bool:
+        """Transfer between accounts and persist both sides"""
+        idempotency_key = scope_key(
+            idempotency_key, "transfer", from_account.account_number
+        )
+        with self._mutation(from_account, to_account):
+            previous = self.idempotency.get(idempotency_key)
+            if previous is not None:
+                return previous
+            rate = self.exchange_rate(from_account.currency, to_account.currency)
+            if rate is None:
+                print(
+                    f"No exchange rate from {from_account.currency} "
+                    f"to {to_account.currency}"
+                )
+                return self._remember(idempotency_key, False)
+            if not from_account.transfer(to_account, amount, rate):
+                return self._remember(idempotency_key, False)
+            self._mark_dirty(from_account, to_account)
+            self._record_transactions(
+                from_account, to_account, idempotency_key=idempotency_key
+            )
+        return True
+
+    def _remember(self, idempotency_key: Optional[str], result: bool) -> bool:
+        """Cache the result of a keyed operation that changed nothing.
+
+        Rejections are only cached in memory and in snapshots taken while
+        they are cached, not in the journal or SQLite. After a restart, a
+        retry of a rejected operation may therefore be applied afresh and
+        succeed, e.g. once the account has funds.
+        """
+        if idempotency_key is not None:
+            self.idempotency.put(idempotency_key, result)
+        return result
+
+    def exchange_rate(self, src: str, dst: str) -> Optional[float]:
+        """Cached rate from src to dst; None if no rate is known"""
+        if src == dst:
+            return 1.0
+        if self.fx_rates is None:
+            return None
+        return self.fx_rates.rate(src, dst)
+
+    @contextmanager
+    def _mutation(self, *accounts: BankAccount):
+        """Apply and persist a change as one step with respect to snapshots.
+
+        Account locks are held until the change is journaled, so journal
+        order always matches the order changes were applied to an account.
+        """
+        # Without a journal or writer every change rewrites the file, so
+        # changes are simply serialized
+        if self.journal or self._writer or self.storage.incremental:
+            gate = self._gate.shared()
+        else:
+            gate = self._gate.exclusive()
+        with gate, lock_accounts(*accounts):
+            yield
+
+        if self._compact_due:
+            with self._persist_lock:
+                due, self._compact_due = self._compact_due, False
+            if due:
+                self.compact()
+
+    @timed("bank.apply_batch")
+    def apply_batch(
+        self, operations: Iterable[dict], atomic: bool = True
+    ) -> BatchResult:
+        """Validate and apply many operations, persisting once at the end.
+
+        Each operation is a dict with "op" (deposit, withdraw or transfer),
+        "account", "amount" and, for transfers, "to_account". With atomic set,
+        nothing is applied unless every operation is valid; otherwise the
+        valid ones are applied and the rest reported as failures.
+        """
+        return self._apply_batch(enumerate(operations, 1), atomic)
+
+    @timed("bank.ingest_file")
+    def ingest_file(self, path: str, atomic: bool = True) -> BatchResult:
+        """Apply a CSV or JSONL batch file; failures are reported by line"""
+        return self._apply_batch(batch.read_operations(path), atomic)
+
+    def schedule_transfer(
+        self,
+        from_account: BankAccount,
+        to_account: BankAccount,
+        amount: float,
+        first_run: datetime.datetime,
+        interval: Optional[datetime.timedelta] = None,
+        until: Optional[datetime.datetime] = None,
+    ) -> Optional[StandingOrder]:
+        """Set up a transfer at first_run, repeated every interval if given"""
+        if not valid_amount(amount):
+            print("Amount must be positive")
+            return None
+        if from_account.account_number == to_account.account_number:
+            print("Cannot transfer to the same account")
+            return None
+        if interval is not None and interval <= datetime.timedelta(0):
+            print("Interval must be positive")
+            return None
+        if until is not None and until < first_run:
+            print("End date is before the first run")
+            return None
+
+        with self._mutation():
+            order = self.scheduler.create(
+                from_account.account_number,
+                to_account.account_number,
+                amount,
+                first_run,
+                interval,
+                until,
+            )
+            self._persist({"op": "schedule", "order": order.to_dict()})
+        return order
+
+    def cancel_scheduled(self, order_id: int) -> bool:
+        """Cancel a standing order; False if there is no such order"""
+        with self._mutation():
+            if not self.scheduler.remove(order_id):
+                return False
+            self._persist({"op": "unschedule", "order_id": order_id})
+        return True
+
+    def scheduled_transfers(self, account: BankAccount) -> List[StandingOrder]:
+        """Standing orders paying out of an account, soonest first"""
+        return self.scheduler.for_account(account.account_number)
+
+    @timed("bank.run_due")
+    def run_due(self, now: Optional[datetime.datetime] = None) -> BatchResult:
+        """Execute every standing order that is due, as one batch.
+
+        Occurrences missed while the bank was down are caught up according
+        to the scheduler's policy. A transfer that fails (e.g. for lack of
+        funds) is reported under its order id and skipped; the order still
+        moves on to its next run. Applied transfers and the orders' new run
+        times are persisted as a single record.
+        """
+        now = now or datetime.datetime.now()
+        with self._tick_lock:
+            due = self.scheduler.pop_due(now)
+            if not due:
+                return BatchResult()
+
+            operations = [
+                (
+                    order.order_id,
+                    {
+                        "op": "transfer",
+                        "account": order.from_account,
+                        "to_account": order.to_account,
+                        "amount": order.amount,
+                    },
+                )
+                for order, runs, _ in due
+                for _ in range(runs)
+            ]
+            committed = False
+
+            def commit() -> dict:
+                nonlocal committed
+                committed = True
+                progress = []
+                for order, _, next_run in due:
+                    self.scheduler.advance(order.order_id, next_run)
+                    progress.append(
+                        [order.order_id, next_run.isoformat() if next_run else None]
+                    )
+                return {"orders": progress}
+
+            try:
+                return self._apply_batch(operations, atomic=False, commit=commit)
+            finally:
+                if not committed:
+                    self.scheduler.requeue(order for order, _, _ in due)
+
+    def _apply_batch(
+        self,
+        numbered,
+        atomic: bool,
+        commit: Optional[Callable[[], dict]] = None,
+    ) -> BatchResult:
+        """Apply numbered operations; commit, if given, runs once they are
+        applied and returns extra fields for the batch's persisted record
+        """
+        result = BatchResult()
+        # One object per account for the whole batch, even in lazy mode
+        seen: Dict[str, BankAccount] = {}
+        parsed = []
+
+        def lookup(account_number: str) -> BankAccount:
+            account = seen.get(account_number) or self.accounts.get(account_number)
+            if account is None:
+                raise ValueError(f"Account not found: {account_number}")
+            seen[account_number] = account
+            return account
+
+        for line, raw in numbered:
+            try:
+                if isinstance(raw, Exception):
+                    raise raw
+                if not isinstance(raw, dict):
+                    raise ValueError("Operation must be an object")
+                op, account_number, amount, to_number = batch.parse_operation(raw)
+                account = lookup(account_number)
+                to_account = lookup(to_number) if op == "transfer" else None
+                rate = 1.0
+                if to_account is not None:
+                    rate = self.exchange_rate(account.currency, to_account.currency)
+                    if rate is None:
+                        raise ValueError(
+                            f"No exchange rate from {account.currency} "
+                            f"to {to_account.currency}"
+                        )
+                    if convert_amount(amount, rate) <= 0:
+                        raise ValueError("Amount is too small to convert")
+            except ValueError as e:
+                result.failures.append((line, str(e)))
+                continue
+            parsed.append((line, op, account, amount, to_account, rate))
+
+        with self._mutation(*seen.values()):
+            # Validate every line against projected balances and against
+            # velocity limits, counting earlier lines of the batch
+            balances: Dict[str, float] = {}
+            outgoing: Dict[str, Tuple[int, float]] = {}
+            planned = []
+            for line, op, account, amount, to_account, rate in parsed:
+                balance = balances.get(account.account_number, account.balance)
+                if op != "deposit" and amount > balance:
+                    result.failures.append((line, "Insufficient funds"))
+                    continue
+                if op != "deposit":
+                    count, total = outgoing.get(account.account_number, (0, 0.0))
+                    limit = velocity.check(account, op, amount, count, total)
+                    if limit:
+                        result.failures.append((line, f"Limit exceeded: {limit}"))
+                        continue
+                    outgoing[account.account_number] = (count + 1, total + amount)
+
+                if op == "deposit":
+                    balances[account.account_number] = balance + amount
+                else:
+                    balances[account.account_number] = balance - amount
+                if to_account is not None:
+                    balances[to_account.account_number] = balances.get(
+                        to_account.account_number, to_account.balance
+                    ) + convert_amount(amount, rate)
+                planned.append((op, account, amount, to_account, rate))
+
+            if atomic and result.failures:
+                result.failures.sort()
+                return result
+
+            # Apply, then persist the whole batch as a single record
+            legs = []
+            for op, account, amount, to_account, rate in planned:
+                if op == "deposit":
+                    account.deposit(amount)
+                elif op == "withdraw":
+                    account.withdraw(amount)
+                else:
+                    account.transfer(to_account, amount, rate)
+
+                for changed in (account, to_account):
+                    if changed is not None:
+                        legs.append(
+                            [
+                                changed.account_number,
+                                changed.balance,
+                                changed.transactions[-1].to_dict(),
+                            ]
+                        )
+
+            result.applied = len(planned)
+            record = {"op": "txn", "legs": legs}
+            if commit is not None:
+                record.update(commit())
+            if legs or commit is not None:
+                self._mark_dirty(*seen.values())
+                self._persist(record)
+
+        result.failures.sort()
+        return result
+
     def find_user_by_phone(self, phone: str) -> Optional[User]:
         """Find a user by phone number"""
-        for user in self.users.values():
-            if user.phone == phone:
-                return user
-        return None
+        return self.users_by_phone.get(phone)
 
     def get_account(self, account_number: str) -> Optional[BankAccount]:
         """Get account by account number"""
         return self.accounts.get(account_number)
 
-    def save_to_file(self) -> None:
-        """Save all data to JSON file"""
-        data = {
+    def get_user_accounts(self, user_id: int) -> List[BankAccount]:
+        """Get all accounts owned by a user"""
+        return [
+            self.accounts[acc_num] for acc_num in self.accounts_by_user.get(user_id, [])
+        ]
+
+    def get_accounts_by_currency(self, currency: str) -> List[BankAccount]:
+        """Get all accounts held in a currency"""
+        return [
+            self.accounts[acc_num]
+            for acc_num in self.accounts_by_currency.get(currency, [])
+        ]
+
+    def balances_as_of(
+        self,
+        when: Union[datetime.date, datetime.datetime],
+        currency: Optional[str] = None,
+    ) -> Dict[str, float]:
+        """Balance of every account (or every account in a currency) at a
+        past moment; a plain date means the end of that day
+        """
+        if not isinstance(when, datetime.datetime):
+            when = datetime.datetime.combine(
+                when, datetime.time()
+            ) + datetime.timedelta(days=1)
+        if currency is None:
+            accounts = (self.accounts[acc_num] for acc_num in list(self.accounts))
+        else:
+            accounts = iter(self.get_accounts_by_currency(currency))
+        return {
+            account.account_number: account.balance_as_of(when) for account in accounts
+        }
+
+    def total_balance(self, currency: str) -> float:
+        """Sum of every balance converted into one currency"""
+        totals: Dict[str, float] = {}
+        for account_currency, numbers in self.accounts_by_currency.items():
+            totals[account_currency] = sum(
+                self.accounts[acc_num].balance for acc_num in numbers
+            )
+        if set(totals) - {currency}:
+            if self.fx_rates is None:
+                raise ValueError("Exchange rates are needed to total currencies")
+            return self.fx_rates.convert_totals(totals, currency)
+        return totals.get(currency, 0.0)
+
+    def _add_user(self, user: User) -> None:
+        self.users[user.user_id] = user
+        self.users_by_phone[user.phone] = user
+
+    def _add_account(self, account: BankAccount) -> None:
+        self.accounts[account.account_number] = account
+        self._index_account(account.account_number, account.user_id, account.currency)
+
+    def _index_account(self, account_number: str, user_id: int, currency: str) -> None:
+        self.accounts_by_user.setdefault(user_id, []).append(account_number)
+        self.accounts_by_currency.setdefault(currency, []).append(account_number)
+
+    def _rebuild_indexes(self) -> None:
+        """Recompute every secondary index from users and accounts"""
+        self.users_by_phone = {user.phone: user for user in self.users.values()}
+        self.accounts_by_user = {}
+        self.accounts_by_currency = {}
+        if isinstance(self.accounts, LazyAccountMap):
+            summaries = self.accounts.summaries()
+        else:
+            summaries = (
+                (account.account_number, account.user_id, account.currency)
+                for account in self.accounts.values()
+            )
+        for account_number, user_id, currency in summaries:
+            self._index_account(account_number, user_id, currency)
+
+    def _mark_dirty(self, *accounts: BankAccount) -> None:
+        """Keep changed accounts resident until they are in a snapshot"""
+        if isinstance(self.accounts, LazyAccountMap):
+            for account in accounts:
+                self.accounts.mark_dirty(account)
+
+    def _record_transactions(
+        self, *accounts: BankAccount, idempotency_key: Optional[str] = None
+    ) -> None:
+        """Persist the latest transaction of each account as one record,
+        together with the idempotency key that produced it
+        """
+        legs = [
+            [
+                account.account_number,
+                account.balance,
+                account.transactions[-1].to_dict(),
+            ]
+            for account in accounts
+        ]
+        record = {"op": "txn", "legs": legs}
+        if idempotency_key is not None:
+            expires = self.idempotency.put(idempotency_key, True)
+            record["key"] = [idempotency_key, expires]
+        self._persist(record)
+
+    def _persist(self, record: dict) -> None:
+        """Make a single mutation durable"""
+        if self.storage.incremental:
+            self.storage.apply(record)
+            return
+
+        if self.journal is None:
+            if self._writer is not None:
+                self._writer.mark_dirty()
+            else:
+                self._save()
+            return
+
+        with self._persist_lock:
+            self.journal_seq += 1
+            record["s"] = self.journal_seq
+            position = self.journal.write(record)
+
+            self._records_since_compact += 1
+            if self.compact_every and self._records_since_compact >= self.compact_every:
+                self._compact_due = True
+
+        # Concurrent writers share one fsync here
+        self.journal.wait_durable(position)
+
+    def _apply_record(self, record: dict) -> None:
+        """Re-apply a journal record on top of the loaded snapshot"""
+        op = record["op"]
+        if op == "user":
+            user = User.from_dict(record["user"])
+            self._add_user(user)
+            self.next_user_id = max(self.next_user_id, user.user_id + 1)
+        elif op == "account":
+            account = BankAccount.from_dict(record["account"])
+            self._add_account(account)
+            owner = self.users.get(account.user_id)
+            if owner:
+                owner.add_account(account.account_number)
+            self.next_account_number = max(
+                self.next_account_number, int(account.account_number) + 1
+            )
+        elif op == "txn":
+            for account_number, balance, txn_data in record["legs"]:
+                account = self.accounts.get(account_number)
+                if account:
+                    account.balance = balance
+                    account.transactions.append(Transaction.from_dict(txn_data))
+                    self._mark_dirty(account)
+            if "key" in record:
+                key, expires = record["key"]
+                self.idempotency.put(key, True, expires)
+            for order_id, next_run in record.get("orders", ()):
+                self.scheduler.advance(
+                    order_id,
+                    datetime.datetime.fromisoformat(next_run) if next_run else None,
+                )
+        elif op == "schedule":
+            self.scheduler.add(StandingOrder.from_dict(record["order"]))
+        elif op == "unschedule":
+            self.scheduler.remove(record["order_id"])
+
+    def _replay_journal(self) -> None:
+        """Apply journal records newer than the loaded snapshot"""
+        for record in self.journal.replay():
+            if record["s"] <= self.journal_seq:
+                continue
+            self._apply_record(record)
+            self.journal_seq = record["s"]
+
+    def flush(self) -> None:
+        """Block until every change made so far is on disk"""
+        if self._writer is not None:
+            self._writer.flush()
+        elif self.journal is not None:
+            self.journal.sync()
+
+    def close(self) -> None:
+        """Write out pending changes and release the data files"""
+        try:
+            if self._writer is not None:
+                self._writer.close()
+            if self.journal is not None:
+                self.save_to_file()
+                self.journal.close()
+        finally:
+            self.storage.close()
+
+    @timed("bank.compact")
+    def compact(self, background: bool = True) -> None:
+        """Fold the journal into a new snapshot while the bank keeps serving"""
+        if self.journal is None:
+            self.save_to_file()
+            return
+
+        with self._compaction_lock:
+            self.wait_for_compaction()
+
+            # Capture the state as of journal_seq; later mutations land in a
+            # fresh journal segment that is replayed on top of this snapshot
+            with self._gate.exclusive():
+                self._records_since_compact = 0
+                seq = self.journal_seq
+                meta, users, accounts = self._capture()
+                self.journal.rotate(seq)
+
+            if background:
+                self._compaction = threading.Thread(
+                    target=self._write_compaction,
+                    args=(seq, meta, users, accounts),
+                    daemon=True,
+                )
+                self._compaction.start()
+            else:
+                self._write_compaction(seq, meta, users, accounts)
+
+    @timed("bank.group_commit")
+    def _group_commit(self) -> None:
+        """Write a snapshot for the background writer.
+
+        Only capturing the state blocks mutations; the file is written
+        while they carry on.
+        """
+        with self._compaction_lock:
+            with self._gate.exclusive():
+                if self.lazy and not isinstance(self.accounts, LazyAccountMap):
+                    # First snapshot of a lazy bank: write it and map it
+                    self._save()
+                    return
+                meta, users, accounts = self._capture()
+
+            self.storage.save(meta, users, accounts)
+            if isinstance(self.accounts, LazyAccountMap):
+                self.accounts.finish_checkpoint()
+
+    def _capture(self) -> Tuple[dict, Dict[int, User], dict]:
+        """Copy meta, users and accounts; the gate must be held exclusively"""
+        users = {}
+        for uid, user in self.users.items():
+            copy = User.from_dict(user.to_dict())
+            # Its own list, or accounts created later leak into the snapshot
+            copy.accounts = list(user.accounts)
+            users[uid] = copy
+        return self._snapshot_meta(), users, self._capture_accounts()
+
+    def _capture_accounts(self) -> dict:
+        if isinstance(self.accounts, LazyAccountMap):
+            return self.accounts.checkpoint()
+        return {acc_num: account.copy() for acc_num, account in self.accounts.items()}
+
+    @timed("bank.write_compaction")
+    def _write_compaction(self, seq: int, meta: dict, users, accounts) -> None:
+        self.storage.save(meta, users, accounts)
+        if isinstance(self.accounts, LazyAccountMap):
+            self.accounts.finish_checkpoint()
+        self.journal.discard_through(seq)
+
+    def wait_for_compaction(self) -> None:
+        """Block until a running background compaction has finished"""
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+
+    def _snapshot_meta(self) -> dict:
+        return {
             "next_user_id": self.next_user_id,
             "next_account_number": self.next_account_number,
-            "users": {str(uid): user.to_dict() for uid, user in self.users.items()},
-            "accounts": {
-                acc_num: account.to_dict() for acc_num, account in self.accounts.items()
-            },
+            "journal_seq": self.journal_seq,
+            "idempotency": self.idempotency.entries(),
+            "next_order_id": self.scheduler.next_order_id,
+            "scheduled": [order.to_dict() for order in self.scheduler.orders.values()],
         }
 
-        with open(self.data_file, "w") as file:
-            json.dump(data, file, indent=2)
+    @timed("bank.save_to_file")
+    def save_to_file(self) -> None:
+        """Save all data to the data file"""
+        with self._compaction_lock:
+            self.wait_for_compaction()
+            with self._gate.exclusive():
+                self._save()
 
-    def load_from_file(self) -> None:
-        """Load data from JSON file"""
-        try:
-            with open(self.data_file, "r") as file:
-                data = json.load(file)
+    def export(self, storage: Storage) -> None:
+        """Write the current state to another storage backend"""
+        with self._compaction_lock:
+            self.wait_for_compaction()
+            with self._gate.exclusive():
+                storage.save(self._snapshot_meta(), self.users, self.accounts)
 
-            self.next_user_id = data["next_user_id"]
-            self.next_account_number = data["next_account_number"]
+    def _save(self) -> None:
+        lazy_map = isinstance(self.accounts, LazyAccountMap)
+        self.storage.save(
+            self._snapshot_meta(),
+            self.users,
+            self.accounts.checkpoint() if lazy_map else self.accounts,
+        )
 
-            # Load users
-            self.users = {}
-            for uid, user_data in data["users"].items():
-                self.users[int(uid)] = User.from_dict(user_data)
+        if lazy_map:
+            self.accounts.finish_checkpoint()
+        elif self.lazy:
+            self.accounts = LazyAccountMap.from_accounts(
+                self.data_file, self.accounts, self.max_resident_accounts
+            )
 
-            # Load accounts
-            self.accounts = {}
-            for acc_num, acc_data in data["accounts"].items():
-                self.accounts[acc_num] = BankAccount.from_dict(acc_data)
+        # Everything in the journal is now part of the snapshot
+        if self.journal is not None:
+            self.journal.truncate()
 
-        except (json.JSONDecodeError, KeyError, FileNotFoundError) as e:
+    @timed("bank.load_from_file")
+    def load_from_file(self) -> None:
+        """Load data from JSON file, then replay the journal tail"""
+        try:
+            if self.storage.exists() or self.journal is None:
+                self._load_snapshot()
+        except (
+            json.JSONDecodeError,
+            sqlite3.DatabaseError,
+            KeyError,
+            FileNotFoundError,
+            ValueError,
+            struct.error,
+        ) as e:
             print(f"Error loading data: {e}")
             # Initialize with empty data
             self.users = {}
-            self.accounts = {}
\ No newline at end of file
+            self.accounts = {}
+
+        self._rebuild_indexes()
+        if self.journal is not None:
+            self._replay_journal()
+
+    def _load_snapshot(self) -> None:
+        """Load the full snapshot in either JSON or binary format"""
+        if self.lazy and snapshot.is_binary(self.data_file):
+            accounts = LazyAccountMap(self.data_file, self.max_resident_accounts)
+            meta, users = accounts.read_header()
+        else:
+            meta, users, accounts = self.storage.load()
+
+        self.next_user_id = meta["next_user_id"]
+        self.next_account_number = meta["next_account_number"]
+        self.journal_seq = meta.get("journal_seq", 0)
+        self.idempotency.load(meta.get("idempotency", []))
+        self.scheduler.load(
+            map(StandingOrder.from_dict, meta.get("scheduled", [])),
+            meta.get("next_order_id", 1),
+        )
+        self.users = users
+        self.accounts = accounts
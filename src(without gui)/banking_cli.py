@@ -1,9 +1,25 @@
+import datetime
+import os
+
+import instrumentation
+import velocity
 from bank_system import BankSystem
+from fx import FileRateProvider, RateTable
+
+FX_RATES_FILE = "fx_rates.json"
+VELOCITY_RULES_FILE = "velocity_rules.json"
 
 
 class BankingCLI:
     def __init__(self):
-        self.bank_system = BankSystem()
+        # Transfers between currencies need a rates file
+        fx_rates = None
+        if os.path.exists(FX_RATES_FILE):
+            fx_rates = RateTable(FileRateProvider(FX_RATES_FILE))
+        self.bank_system = BankSystem(journal=True, fx_rates=fx_rates)
+        # Optional limits on withdrawals and transfers
+        if os.path.exists(VELOCITY_RULES_FILE):
+            velocity.configure(velocity.load_rules(VELOCITY_RULES_FILE))
         self.current_user = None
 
     def display_menu(self):
@@ -18,14 +34,19 @@ class BankingCLI:
             print("5. Transfer Money")
             print("6. Account Statement")
             print("7. Logout")
+            print("8. Performance Statistics")
+            print("9. Standing Orders")
         else:
             print("1. Register")
             print("2. Login")
             print("3. Exit")
+            print("4. Performance Statistics")
 
     def run(self):
         """Main program loop"""
         while True:
+            # Standing orders that came due (or were missed) run first
+            self.bank_system.run_due()
             self.display_menu()
             choice = input("\nEnter your choice: ")
 
@@ -37,8 +58,14 @@ class BankingCLI:
                 elif choice == "2":
                     self.login()
                 elif choice == "3":
+                    try:
+                        self.bank_system.close()
+                    except Exception as e:
+                        print(f"Warning: recent changes were not saved: {e}")
                     print("Thank you for using our banking system!")
                     break
+                elif choice == "4":
+                    self.show_stats()
                 else:
                     print("Invalid choice. Please try again.")
 
@@ -59,6 +86,10 @@ class BankingCLI:
         elif choice == "7":
             print(f"Goodbye, {self.current_user.full_name}!")
             self.current_user = None
+        elif choice == "8":
+            self.show_stats()
+        elif choice == "9":
+            self.standing_orders()
         else:
             print("Invalid choice. Please try again.")
 
@@ -160,11 +191,10 @@ class BankingCLI:
 
         try:
             amount = float(input(f"Enter amount to deposit ({account.currency}): "))
-            if account.deposit(amount):
+            if self.bank_system.deposit(account, amount):
                 print(
                     f"Deposit successful! New balance: {account.currency} {account.balance:.2f}"
                 )
-                self.bank_system.save_to_file()
         except ValueError:
             print("Please enter a valid amount.")
 
@@ -177,11 +207,10 @@ class BankingCLI:
 
         try:
             amount = float(input(f"Enter amount to withdraw ({account.currency}): "))
-            if account.withdraw(amount):
+            if self.bank_system.withdraw(account, amount):
                 print(
                     f"Withdrawal successful! New balance: {account.currency} {account.balance:.2f}"
                 )
-                self.bank_system.save_to_file()
         except ValueError:
             print("Please enter a valid amount.")
 
@@ -207,15 +236,74 @@ class BankingCLI:
             amount = float(
                 input(f"Enter amount to transfer ({from_account.currency}): ")
             )
-            if from_account.transfer(to_account, amount):
+            if self.bank_system.transfer(from_account, to_account, amount):
                 print(f"Transfer successful!")
                 print(
                     f"Source account balance: {from_account.currency} {from_account.balance:.2f}"
                 )
-                self.bank_system.save_to_file()
         except ValueError:
             print("Please enter a valid amount.")
 
+    def standing_orders(self):
+        """List, set up or cancel scheduled transfers from an account"""
+        print("\n--- Standing Orders ---")
+        account = self.select_account("Select source account: ")
+        if not account:
+            return
+
+        orders = self.bank_system.scheduled_transfers(account)
+        if not orders:
+            print("No standing orders for this account.")
+        for order in orders:
+            if order.interval:
+                repeat = f"every {order.interval.total_seconds() / 86400:g} days"
+            else:
+                repeat = "once"
+            print(
+                f"#{order.order_id}: {account.currency} {order.amount:.2f} to "
+                f"{order.to_account}, next {order.next_run:%Y-%m-%d %H:%M}, {repeat}"
+            )
+
+        action = input("1. New standing order  2. Cancel one  (Enter to go back): ")
+        if action.strip() == "1":
+            self.new_standing_order(account)
+        elif action.strip() == "2":
+            try:
+                order_id = int(input("Order number to cancel: ").lstrip("#"))
+            except ValueError:
+                print("Please enter a number.")
+                return
+            if order_id not in {order.order_id for order in orders}:
+                print("Standing order not found.")
+            elif self.bank_system.cancel_scheduled(order_id):
+                print("Standing order cancelled.")
+
+    def new_standing_order(self, account):
+        """Schedule a one-off or repeating transfer from account"""
+        to_account = self.bank_system.get_account(
+            input("Enter destination account number: ")
+        )
+        if not to_account:
+            print("Destination account not found.")
+            return
+
+        try:
+            amount = float(input(f"Enter amount to transfer ({account.currency}): "))
+            first_run = datetime.datetime.strptime(
+                input("First payment date (YYYY-MM-DD): ").strip(), "%Y-%m-%d"
+            )
+            days = int(input("Repeat every how many days (0 for once): ") or 0)
+        except ValueError:
+            print("Please enter a valid amount, date and number of days.")
+            return
+
+        interval = datetime.timedelta(days=days) if days > 0 else None
+        order = self.bank_system.schedule_transfer(
+            account, to_account, amount, first_run, interval
+        )
+        if order:
+            print(f"Standing order #{order.order_id} set up.")
+
     def view_statement(self):
         """View transaction history for an account"""
         print("\n--- Account Statement ---")
@@ -227,6 +315,32 @@ class BankingCLI:
         print(f"Current Balance: {account.currency} {account.balance:.2f}")
         print("=" * 50)
 
-        statements = account.get_statement()
-        for stmt in statements:
-            print(stmt)
\ No newline at end of file
+        if not account.transactions:
+            print("No transactions found")
+            return
+
+        # Newest first, one page at a time
+        cursor = None
+        while True:
+            statements, cursor = account.get_statement_page(20, cursor)
+            for stmt in statements:
+                print(stmt)
+            if cursor is None:
+                break
+            if input("Show older transactions? (y/n): ").strip().lower() != "y":
+                break
+
+    def show_stats(self):
+        """Print per-operation latency statistics and optionally save them"""
+        print("\n--- Performance Statistics ---")
+        if not instrumentation.is_enabled():
+            print("Instrumentation is off (set BANK_INSTRUMENT=1 to start with it on).")
+            if input("Enable it now? (y/n): ").strip().lower() == "y":
+                instrumentation.enable()
+            return
+
+        print(instrumentation.format_report())
+        path = input("Save as JSON to (leave empty to skip): ").strip()
+        if path:
+            instrumentation.dump(path)
+            print(f"Statistics written to {path}")
\ No newline at end of file
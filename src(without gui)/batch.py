@@ -0,0 +1,100 @@
+import argparse
+import csv
+import json
+from typing import Iterator, List, Optional, Tuple
+
+from bank_account import valid_amount
+
+OPERATIONS = ("deposit", "withdraw", "transfer")
+CSV_FIELDS = ["op", "account", "amount", "to_account"]
+
+
+class BatchResult:
+    def __init__(self):
+        self.applied = 0
+        self.failures: List[Tuple[int, str]] = []  # (line, reason)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+    def __repr__(self) -> str:
+        return f"BatchResult(applied={self.applied}, failures={len(self.failures)})"
+
+
+def parse_operation(raw: dict) -> Tuple[str, str, float, Optional[str]]:
+    """Normalize one batch line to (op, account, amount, to_account)"""
+    op = raw.get("op")
+    if op not in OPERATIONS:
+        raise ValueError(f"Unknown operation: {op}")
+
+    account = raw.get("account")
+    if not account:
+        raise ValueError("Missing account")
+
+    try:
+        amount = float(raw.get("amount"))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid amount: {raw.get('amount')}")
+    if not valid_amount(amount):
+        raise ValueError(f"Invalid amount: {raw.get('amount')}")
+
+    to_account = raw.get("to_account") or None
+    if op == "transfer":
+        if not to_account:
+            raise ValueError("Missing destination account")
+        if to_account == account:
+            raise ValueError("Cannot transfer to the same account")
+    return op, str(account), amount, to_account and str(to_account)
+
+
+def read_operations(path: str) -> Iterator[Tuple[int, object]]:
+    """Yield (line, operation) from a CSV or JSONL file.
+
+    A line that cannot be decoded is yielded as the ValueError describing it.
+    """
+    if path.endswith(".csv"):
+        with open(path, newline="") as file:
+            reader = csv.DictReader(file)
+            if reader.fieldnames and "op" not in reader.fieldnames:
+                # No header row: use the default column order
+                file.seek(0)
+                reader = csv.DictReader(file, fieldnames=CSV_FIELDS)
+            for raw in reader:
+                yield reader.line_num, raw
+        return
+
+    with open(path) as file:
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, ValueError(f"Invalid JSON: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Post a CSV or JSONL batch file")
+    parser.add_argument("path", help="batch file (.csv or .jsonl)")
+    parser.add_argument("--data-file", default="bank_data.json")
+    parser.add_argument(
+        "--best-effort",
+        action="store_true",
+        help="apply valid lines even if others fail",
+    )
+    args = parser.parse_args()
+
+    from bank_system import BankSystem
+
+    bank = BankSystem(args.data_file, journal=True)
+    result = bank.ingest_file(args.path, atomic=not args.best_effort)
+    bank.close()
+
+    for line, reason in result.failures:
+        print(f"line {line}: {reason}")
+    print(f"Applied {result.applied} operations, {len(result.failures)} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import datetime
+import os
+import tempfile
+
+from benchmarks.common import build_bank, time_call
+
+
+def naive_balance(account, when: datetime.datetime) -> float:
+    """Replay the whole history up to when"""
+    balance = 0.0
+    for transaction in account.transactions:
+        if transaction.timestamp >= when:
+            continue
+        if transaction.type == "deposit" or (
+            transaction.type == "transfer"
+            and transaction.to_account == account.account_number
+        ):
+            balance += transaction.amount
+        else:
+            balance -= transaction.amount
+    return balance
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Balances-as-of report: full replay vs running-balance checkpoints"
+    )
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--transactions", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        bank = build_bank(
+            os.path.join(directory, "bank_data.json"),
+            args.users,
+            2,
+            args.transactions,
+        )
+        # Halfway through the generated history
+        first = next(iter(bank.accounts.values())).transactions
+        when = first[0].timestamp + (first[-1].timestamp - first[0].timestamp) / 2
+
+        naive = min(
+            time_call(
+                lambda: {n: naive_balance(a, when) for n, a in bank.accounts.items()},
+                args.repeat,
+            )
+        )
+        # The first report builds the checkpoints; later ones reuse them
+        first_report = min(time_call(lambda: bank.balances_as_of(when), 1))
+        report = min(time_call(lambda: bank.balances_as_of(when), args.repeat))
+        print(f"{len(bank.accounts)} accounts, {args.transactions} transactions each")
+        print(f"   full replay: {naive * 1000:9.1f} ms")
+        print(f"  first report: {first_report * 1000:9.1f} ms (builds checkpoints)")
+        print(f"   checkpoints: {report * 1000:9.1f} ms")
+        print(f"       speedup: {naive / report:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
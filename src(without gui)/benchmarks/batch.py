@@ -0,0 +1,110 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from bank_system import BankSystem
+from benchmarks.common import FIXTURE_RATES, build_bank
+
+
+def make_operations(account_numbers, count: int, seed: int = 7):
+    rng = random.Random(seed)
+    operations = []
+    for _ in range(count):
+        roll = rng.random()
+        account = rng.choice(account_numbers)
+        amount = round(rng.uniform(1, 20), 2)
+        if roll < 0.5:
+            operations.append({"op": "deposit", "account": account, "amount": amount})
+        elif roll < 0.7:
+            operations.append({"op": "withdraw", "account": account, "amount": amount})
+        else:
+            target = rng.choice(account_numbers)
+            if target == account:
+                operations.append(
+                    {"op": "deposit", "account": account, "amount": amount}
+                )
+            else:
+                operations.append(
+                    {
+                        "op": "transfer",
+                        "account": account,
+                        "amount": amount,
+                        "to_account": target,
+                    }
+                )
+    return operations
+
+
+def one_at_a_time(bank, operations) -> None:
+    for operation in operations:
+        account = bank.get_account(operation["account"])
+        if operation["op"] == "deposit":
+            bank.deposit(account, operation["amount"])
+        elif operation["op"] == "withdraw":
+            bank.withdraw(account, operation["amount"])
+        else:
+            to_account = bank.get_account(operation["to_account"])
+            bank.transfer(account, to_account, operation["amount"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure batch posting throughput")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--operations", type=int, default=20_000)
+    parser.add_argument(
+        "--rewrite-operations",
+        type=int,
+        default=200,
+        help="operations to time in full-file-rewrite mode",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "bank.json")
+        bank = build_bank(source, args.users, 2, 10)
+        operations = make_operations(list(bank.accounts), args.operations)
+
+        def fresh_bank(name: str, **options) -> BankSystem:
+            path = os.path.join(directory, name + ".json")
+            shutil.copy(source, path)
+            return BankSystem(path, fx_rates=FIXTURE_RATES, **options)
+
+        journaled = {"journal": True, "fsync_policy": "always"}
+        runs = [
+            (
+                "batch, all-or-nothing",
+                operations,
+                lambda ops: fresh_bank("atomic", **journaled).apply_batch(ops, True),
+            ),
+            (
+                "batch, best-effort",
+                operations,
+                lambda ops: fresh_bank("best", **journaled).apply_batch(ops, False),
+            ),
+            (
+                "per operation, journaled",
+                operations,
+                lambda ops: one_at_a_time(fresh_bank("journal", **journaled), ops),
+            ),
+            (
+                "per operation, rewrite",
+                operations[: args.rewrite_operations],
+                lambda ops: one_at_a_time(fresh_bank("rewrite"), ops),
+            ),
+        ]
+        for name, ops, run in runs:
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                result = run(ops)
+                elapsed = time.perf_counter() - start
+            detail = f"  {result}" if result is not None else ""
+            print(f"{name:>26}: {len(ops) / elapsed:12,.0f} ops/sec{detail}")
+
+
+if __name__ == "__main__":
+    main()
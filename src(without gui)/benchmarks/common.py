@@ -0,0 +1,76 @@
+import random
+import time
+from typing import Callable, List
+
+import passwords
+from bank_system import BankSystem
+from fx import RateTable, StaticRateProvider
+
+# Cheap password hashing so large fixtures build quickly; benchmarks.login
+# measures the real KDF
+FIXTURE_KDF = {"algorithm": "pbkdf2_sha256", "iterations": 1}
+
+# Par rates so transfers between fixture currencies conserve total money
+FIXTURE_RATES = RateTable(StaticRateProvider("USD", {"EUR": 1.0, "GBP": 1.0}))
+
+
+def build_bank(
+    data_file: str,
+    users: int = 1000,
+    accounts_per_user: int = 2,
+    transactions_per_account: int = 50,
+    seed: int = 42,
+    **options,
+) -> BankSystem:
+    """Build and save a synthetic bank of the requested size"""
+    rng = random.Random(seed)
+    options.setdefault("fx_rates", FIXTURE_RATES)
+    bank = BankSystem(data_file, journal=True, fsync_policy="never", **options)
+
+    accounts = []
+    with passwords.using(**FIXTURE_KDF):
+        for i in range(users):
+            user = bank.register_user(f"User {i}", f"+1555{i:07d}", f"password{i}")
+            for _ in range(accounts_per_user):
+                accounts.append(
+                    bank.create_account(user, rng.choice(["USD", "EUR", "GBP"]))
+                )
+
+    # Deposits and withdrawals mutate accounts directly; transfers go through
+    # the bank so FIXTURE_RATES convert between currencies. The whole bank
+    # is saved once at the end
+    for account in accounts:
+        account.deposit(round(rng.uniform(1000, 5000), 2))
+    for account in accounts:
+        for _ in range(transactions_per_account - 1):
+            roll = rng.random()
+            amount = round(rng.uniform(1, 100), 2)
+            if roll < 0.4:
+                account.deposit(amount)
+            elif roll < 0.7 and amount <= account.balance:
+                account.withdraw(amount)
+            else:
+                target = rng.choice(accounts)
+                if target is not account and amount <= account.balance:
+                    bank.transfer(account, target, amount)
+                else:
+                    account.deposit(amount)
+
+    bank.save_to_file()
+    return bank
+
+
+def time_call(func: Callable[[], object], repeat: int = 5) -> List[float]:
+    """Return wall-clock seconds for each of repeat calls"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of values, fraction in [0, 1]"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
@@ -0,0 +1,83 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bank_system import BankSystem
+from benchmarks.common import FIXTURE_RATES, build_bank
+
+
+def random_transfers(bank: BankSystem, account_numbers, count: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(count):
+        source, target = rng.sample(account_numbers, 2)
+        bank.transfer(
+            bank.get_account(source),
+            bank.get_account(target),
+            round(rng.uniform(1, 50), 2),
+        )
+
+
+def total_money(bank: BankSystem) -> float:
+    return round(sum(account.balance for account in bank.accounts.values()), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Stress concurrent transfers and check money is conserved"
+    )
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--transfers", type=int, default=4000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--fsync", choices=["always", "never"], default="always")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "bank.json")
+        build_bank(source, args.users, 2, 5)
+
+        for threads in args.threads:
+            path = os.path.join(directory, f"bank-{threads}.json")
+            shutil.copy(source, path)
+            bank = BankSystem(
+                path, journal=True, fsync_policy=args.fsync, fx_rates=FIXTURE_RATES
+            )
+            account_numbers = list(bank.accounts)
+            before = total_money(bank)
+
+            per_thread = args.transfers // threads
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                with ThreadPoolExecutor(threads) as pool:
+                    futures = [
+                        pool.submit(
+                            random_transfers, bank, account_numbers, per_thread, seed
+                        )
+                        for seed in range(threads)
+                    ]
+                    for future in futures:
+                        future.result()
+            elapsed = time.perf_counter() - start
+
+            # Replaying the journal must give the same books
+            bank.journal.close()
+            reloaded = BankSystem(path, journal=True)
+            after = total_money(bank)
+            assert before == after == total_money(reloaded), (before, after)
+            assert all(
+                reloaded.accounts[number].balance == account.balance
+                for number, account in bank.accounts.items()
+            )
+            print(
+                f"{threads:3d} threads: {per_thread * threads / elapsed:10,.0f} "
+                f"transfers/sec, total money {after:,.2f} conserved"
+            )
+
+
+if __name__ == "__main__":
+    main()
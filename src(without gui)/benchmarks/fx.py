@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from fx import FileRateProvider, RateTable
+
+CURRENCIES = ["EUR", "GBP", "JPY", "CHF", "CAD", "AUD", "UZS", "KZT", "TRY", "CNY"]
+
+
+def per_call(func, calls: int) -> float:
+    """Microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exchange rates: provider fetch per transfer vs cached cross rates"
+    )
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--accounts", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "fx_rates.json")
+        with open(path, "w") as file:
+            rates = {c: round(rng.uniform(0.5, 200), 4) for c in CURRENCIES}
+            json.dump({"base": "USD", "rates": rates}, file)
+        provider = FileRateProvider(path)
+        table = RateTable(provider)
+
+        def fetch_rate():
+            _, rates = provider.fetch()
+            return rates["GBP"] / rates["EUR"]
+
+        fetch = per_call(fetch_rate, args.calls)
+        cached = per_call(lambda: table.rate("EUR", "GBP"), args.calls * 100)
+        print(f"  provider fetch: {fetch:9.2f} us per rate")
+        print(f"    cached table: {cached:9.2f} us per rate ({fetch / cached:.0f}x)")
+
+        balances = [
+            (rng.uniform(0, 5000), rng.choice(CURRENCIES + ["USD"]))
+            for _ in range(args.accounts)
+        ]
+        start = time.perf_counter()
+        one_by_one = sum(table.convert(amount, c, "USD") for amount, c in balances)
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        totals = {}
+        for amount, c in balances:
+            totals[c] = totals.get(c, 0.0) + amount
+        batched = table.convert_totals(totals, "USD")
+        grouped = time.perf_counter() - start
+        print(f"{args.accounts} balances totalled in USD")
+        print(f"   convert each: {single * 1000:9.1f} ms ({one_by_one:,.2f})")
+        print(f"   batch totals: {grouped * 1000:9.1f} ms ({batched:,.2f})")
+
+
+if __name__ == "__main__":
+    main()
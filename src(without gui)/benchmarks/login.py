@@ -0,0 +1,98 @@
+import argparse
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import passwords
+from bank_system import BankSystem
+from benchmarks.common import percentile
+
+
+def run_logins(bank: BankSystem, users: list, logins: int, threads: int) -> tuple:
+    """Fire logins from a thread pool while one thread keeps depositing.
+
+    Returns (logins per second, p99 deposit latency in seconds).
+    """
+    account = bank.create_account(users[0][0])
+    deposit_latencies = []
+    done = threading.Event()
+
+    def deposit_loop():
+        while not done.is_set():
+            start = time.perf_counter()
+            bank.deposit(account, 1.0)
+            deposit_latencies.append(time.perf_counter() - start)
+            time.sleep(0.001)
+
+    def login(i: int):
+        user, password = users[i % len(users)]
+        assert bank.login(user.phone, password)
+
+    depositor = threading.Thread(target=deposit_loop)
+    depositor.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    depositor.join()
+    return logins / elapsed, percentile(deposit_latencies, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Login throughput with the KDF inline or in a process pool"
+    )
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        help="process pool sizes to try; 0 hashes inline (default: 0 1 2 4 ... cores)",
+    )
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or [0] + [1 << i for i in range(cores.bit_length())]
+    print(f"{cores} cores, KDF {passwords.current_params()}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        bank = BankSystem(os.path.join(directory, "bank_data.json"), journal=True)
+        users = []
+        for i in range(args.users):
+            password = f"password{i}"
+            users.append(
+                (bank.register_user(f"User {i}", f"+1555{i:07d}", password), password)
+            )
+
+        for count in workers:
+            if count:
+                passwords.start_pool(count)
+            else:
+                passwords.stop_pool()
+            rate, deposit_p99 = run_logins(bank, users, args.logins, args.threads)
+            label = f"{count} workers" if count else "inline"
+            print(
+                f"{label:>10}: {rate:8.1f} logins/sec  "
+                f"deposit p99 {deposit_p99 * 1000:7.1f} ms"
+            )
+        passwords.stop_pool()
+
+        # First login after an upgrade from the legacy unsalted hash
+        user, password = users[0]
+        user.password = hashlib.sha256(password.encode()).hexdigest()
+        start = time.perf_counter()
+        bank.login(user.phone, password)
+        elapsed = time.perf_counter() - start
+        assert not passwords.needs_rehash(user.password)
+        print(f"legacy login with rehash: {elapsed * 1000:.1f} ms")
+        bank.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import gc
+import random
+import tracemalloc
+
+from transaction import Transaction
+from transaction_store import TransactionStore
+
+
+def measure(build) -> int:
+    """Return bytes still allocated by the object build() returns"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def make_transactions(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    for _ in range(count):
+        roll = rng.random()
+        amount = round(rng.uniform(1, 500), 2)
+        if roll < 0.4:
+            yield Transaction("deposit", amount, "10000")
+        elif roll < 0.7:
+            yield Transaction("withdraw", amount, "10000")
+        else:
+            yield Transaction(
+                "transfer", amount, "10000", str(rng.randint(10001, 20000))
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare memory of list-of-objects and columnar transactions"
+    )
+    parser.add_argument("--transactions", type=int, default=200_000)
+    args = parser.parse_args()
+
+    as_list = measure(lambda: list(make_transactions(args.transactions)))
+
+    def build_store():
+        store = TransactionStore()
+        store.extend(make_transactions(args.transactions))
+        return store
+
+    as_store = measure(build_store)
+
+    for name, size in (
+        ("list of Transaction", as_list),
+        ("TransactionStore", as_store),
+    ):
+        print(
+            f"{name:>20}: {size / 1024 / 1024:8.1f} MiB"
+            f"  ({size / args.transactions:.0f} bytes/transaction)"
+        )
+    print(f"reduction: {as_list / as_store:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
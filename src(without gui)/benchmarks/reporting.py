@@ -0,0 +1,86 @@
+import argparse
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmarks.common import build_bank, time_call
+from reporting import ReportingEngine
+
+
+def naive_reports(bank) -> tuple:
+    """The same reports by looping over every account's transactions"""
+    daily = defaultdict(lambda: [0, 0.0])
+    by_type = defaultdict(lambda: [0, 0.0])
+    by_currency = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+    turnover = defaultdict(float)
+    for account in bank.accounts.values():
+        for transaction in account.transactions:
+            turnover[account.account_number] += transaction.amount
+            if (
+                transaction.type == "transfer"
+                and transaction.from_account != account.account_number
+            ):
+                continue
+            for totals in (
+                daily[transaction.timestamp.date()],
+                by_type[transaction.type],
+                by_currency[account.currency][transaction.type],
+            ):
+                totals[0] += 1
+                totals[1] += transaction.amount
+    top = sorted(turnover.items(), key=lambda item: -item[1])[:10]
+    return daily, by_type, by_currency, top
+
+
+def engine_reports(engine: ReportingEngine) -> tuple:
+    engine.refresh()
+    return (
+        engine.daily_volume(),
+        engine.type_breakdown(),
+        engine.currency_totals(),
+        engine.top_accounts(10),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bank-wide reports: Python loop vs vectorized NumPy columns"
+    )
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=100)
+    parser.add_argument("--new", type=int, default=1000, help="deposits between runs")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        bank = build_bank(
+            os.path.join(directory, "bank_data.json"), args.users, 2, args.transactions
+        )
+        engine = ReportingEngine(bank)
+
+        start = time.perf_counter()
+        rows = engine.refresh()
+        export = time.perf_counter() - start
+
+        naive = min(time_call(lambda: naive_reports(bank), args.repeat))
+        vectorized = min(time_call(lambda: engine_reports(engine), args.repeat))
+
+        accounts = list(bank.accounts.values())
+        for i in range(args.new):
+            accounts[i % len(accounts)].deposit(1.0)
+        start = time.perf_counter()
+        engine_reports(engine)
+        incremental = time.perf_counter() - start
+
+        print(f"{rows} transaction rows")
+        print(f"   initial export: {export * 1000:9.1f} ms")
+        print(f"       naive loop: {naive * 1000:9.1f} ms")
+        print(
+            f"       vectorized: {vectorized * 1000:9.1f} ms  ({naive / vectorized:.0f}x)"
+        )
+        print(f"  +{args.new} and rerun: {incremental * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from benchmarks.common import percentile
+
+
+class Client:
+    def __init__(self, reader, writer, latencies: List[float]):
+        self.reader = reader
+        self.writer = writer
+        self.latencies = latencies
+        self.token = None
+        self._next_id = 0
+
+    async def call(self, cmd: str, **args) -> dict:
+        self._next_id += 1
+        request = {"id": self._next_id, "cmd": cmd, "token": self.token, "args": args}
+        start = time.perf_counter()
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        response = json.loads(await self.reader.readline())
+        self.latencies.append(time.perf_counter() - start)
+        return response
+
+
+async def run_client(host, port, index: int, requests: int, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    client = Client(reader, writer, latencies)
+
+    response = await client.call(
+        "register", full_name=f"Load {index}", phone=f"+1999{index:07d}", password="pw"
+    )
+    client.token = response["result"]["token"]
+    response = await client.call("create_account", currency="USD")
+    account = response["result"]["account_number"]
+    await client.call("deposit", account=account, amount=1000)
+
+    for i in range(requests):
+        if i % 4 == 0:
+            response = await client.call("statement", account=account, limit=10)
+        elif i % 2:
+            response = await client.call("deposit", account=account, amount=5)
+        else:
+            response = await client.call("withdraw", account=account, amount=3)
+        if not response["ok"]:
+            errors.append(response["error"])
+
+    writer.close()
+    await writer.wait_closed()
+
+
+async def generate_load(host, port, connections: int, requests: int):
+    latencies: List[float] = []
+    errors: List[str] = []
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            run_client(host, port, i, requests, latencies, errors)
+            for i in range(connections)
+        )
+    )
+    return time.perf_counter() - start, latencies, errors
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the bank server")
+    parser.add_argument("--connections", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=50, help="per connection")
+    parser.add_argument(
+        "--connect",
+        metavar="HOST:PORT",
+        help="use a running server instead of starting one",
+    )
+    args = parser.parse_args()
+
+    server = None
+    with tempfile.TemporaryDirectory() as directory:
+        if args.connect:
+            host, port = args.connect.rsplit(":", 1)
+            port = int(port)
+        else:
+            host, port = "127.0.0.1", free_port()
+            server = subprocess.Popen(
+                [
+                    sys.executable,
+                    "server.py",
+                    "--port",
+                    str(port),
+                    "--data-file",
+                    os.path.join(directory, "bank.json"),
+                ],
+                stdout=subprocess.DEVNULL,
+            )
+            wait_for_port(port)
+
+        try:
+            elapsed, latencies, errors = asyncio.run(
+                generate_load(host, port, args.connections, args.requests)
+            )
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    print(f"{len(latencies)} requests over {args.connections} connections")
+    print(f"throughput: {len(latencies) / elapsed:,.0f} requests/sec")
+    for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+        print(f"{name}: {percentile(latencies, fraction) * 1000:.2f} ms")
+    if errors:
+        print(f"{len(errors)} failed requests, e.g. {errors[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import os
+import tempfile
+
+from bank_system import BankSystem
+from benchmarks.common import build_bank, time_call
+from sharded_storage import ShardedStorage
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure how sharded load and save scale with worker count"
+    )
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--accounts-per-user", type=int, default=2)
+    parser.add_argument("--transactions", type=int, default=100)
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--format", choices=["json", "binary"], default="json")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        help="worker counts to try (default: 1, 2, 4, ... up to the core count)",
+    )
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or [1 << i for i in range(cores.bit_length())]
+    if not args.workers and cores not in workers:
+        workers.append(cores)
+
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = os.path.join(directory, "bank_data.json")
+        build_bank(
+            data_file,
+            args.users,
+            args.accounts_per_user,
+            args.transactions,
+            snapshot_format=args.format,
+        ).journal.close()
+        bank = BankSystem(data_file)
+        load = min(time_call(lambda: BankSystem(data_file), args.repeat))
+        save = min(time_call(bank.save_to_file, args.repeat))
+        print(f"{cores} cores, {len(bank.accounts)} accounts, {args.format} files")
+        print(
+            f"{'single file':>12}: load {load * 1000:9.1f} ms  save {save * 1000:9.1f} ms"
+        )
+
+        manifest = os.path.join(directory, "sharded")
+        for count in workers:
+            storage = ShardedStorage(manifest, args.shards, count, args.format)
+            save = min(time_call(lambda: bank.export(storage), args.repeat))
+            load = min(
+                time_call(lambda: BankSystem(manifest, storage=storage), args.repeat)
+            )
+            print(
+                f"{count:>4} workers: load {load * 1000:9.1f} ms  "
+                f"save {save * 1000:9.1f} ms"
+            )
+            storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import argparse
+import os
+import tempfile
+
+import snapshot
+from bank_system import BankSystem
+from benchmarks.common import build_bank, time_call
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare cold-start time of JSON and binary snapshots"
+    )
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--accounts-per-user", type=int, default=2)
+    parser.add_argument("--transactions", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = os.path.join(directory, "bank_data.json")
+        binary_file = os.path.join(directory, "bank_data.bin")
+        build_bank(json_file, args.users, args.accounts_per_user, args.transactions)
+        snapshot.convert(json_file, binary_file, "binary")
+
+        results = {}
+        for name, path, options in (
+            ("json", json_file, {}),
+            ("binary", binary_file, {}),
+            ("lazy", binary_file, {"lazy": True}),
+        ):
+            timings = time_call(lambda: BankSystem(path, **options), args.repeat)
+            results[name] = min(timings)
+            size = os.path.getsize(path) / 1024 / 1024
+            print(f"{name:>6}: {results[name] * 1000:9.1f} ms  ({size:.1f} MiB)")
+
+        print(f"binary speedup: {results['json'] / results['binary']:.1f}x")
+        print(f"lazy speedup: {results['json'] / results['lazy']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
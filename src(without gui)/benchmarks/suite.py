@@ -0,0 +1,250 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import passwords
+from bank_system import BankSystem
+from benchmarks.common import FIXTURE_KDF, FIXTURE_RATES, build_bank, percentile
+from sqlite_storage import SQLiteStorage, migrate
+
+
+def run_benchmark(name: str, func: Callable[[int], object], iterations: int) -> dict:
+    """Time each call of func(i) and measure the peak memory of one call"""
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(iterations):
+            start = time.perf_counter()
+            func(i)
+            latencies.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        func(iterations)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    total = sum(latencies)
+    return {
+        "name": name,
+        "iterations": iterations,
+        "ops_per_sec": iterations / total if total else float("inf"),
+        "p50_us": percentile(latencies, 0.50) * 1e6,
+        "p95_us": percentile(latencies, 0.95) * 1e6,
+        "p99_us": percentile(latencies, 0.99) * 1e6,
+        "max_us": max(latencies) * 1e6,
+        "peak_kib": peak / 1024,
+    }
+
+
+def run_suite(directory: str, args) -> List[dict]:
+    data_file = os.path.join(directory, "bank_data.json")
+    options = {"snapshot_format": args.format, "fx_rates": FIXTURE_RATES}
+    bank = build_bank(
+        data_file,
+        args.users,
+        args.accounts_per_user,
+        args.transactions,
+        seed=args.seed,
+        **options,
+    )
+    bank.journal.close()
+
+    if args.sqlite:
+        database = os.path.join(directory, "bank.db")
+        migrate(data_file, database)
+
+        def open_bank() -> BankSystem:
+            return BankSystem(
+                database, storage=SQLiteStorage(database), fx_rates=FIXTURE_RATES
+            )
+
+    else:
+
+        def open_bank() -> BankSystem:
+            return BankSystem(
+                data_file,
+                journal=args.journal and not args.write_behind,
+                fsync_policy=args.fsync,
+                write_behind=args.write_behind,
+                **options,
+            )
+
+    bank = open_bank()
+
+    rng = random.Random(args.seed)
+    user_ids = list(bank.users)
+    account_numbers = list(bank.accounts)
+    n = args.iterations
+
+    def random_user():
+        return bank.users[rng.choice(user_ids)]
+
+    def random_account():
+        return bank.accounts[rng.choice(account_numbers)]
+
+    def transfer(_):
+        source, target = rng.sample(account_numbers, 2)
+        bank.transfer(bank.accounts[source], bank.accounts[target], 1.0)
+
+    def login(_):
+        user = random_user()
+        # build_bank gives user N the password "passwordN"
+        bank.login(user.phone, f"password{user.user_id - 1}")
+
+    def statement_month(_):
+        account = random_account()
+        start = datetime.datetime.now().replace(day=1, hour=0, minute=0)
+        list(account.iter_statement(start))
+
+    benchmarks = [
+        (
+            "register_user",
+            lambda i: bank.register_user(f"New {i}", f"+1666{i:07d}", "secret"),
+            n,
+        ),
+        ("login", login, n),
+        (
+            "find_user_by_phone",
+            lambda _: bank.find_user_by_phone(random_user().phone),
+            n,
+        ),
+        ("create_account", lambda _: bank.create_account(random_user(), "USD"), n),
+        ("deposit", lambda _: bank.deposit(random_account(), 10.0), n),
+        ("withdraw", lambda _: bank.withdraw(random_account(), 1.0), n),
+        ("transfer", transfer, n),
+        ("get_statement", lambda _: random_account().get_statement(), n),
+        (
+            "get_statement_page",
+            lambda _: random_account().get_statement_page(20),
+            n,
+        ),
+        ("iter_statement_month", statement_month, n),
+        ("save_to_file", lambda _: bank.save_to_file(), args.io_iterations),
+        (
+            "load_from_file",
+            lambda _: open_bank().storage.close(),
+            args.io_iterations,
+        ),
+    ]
+
+    results = []
+    for name, func, iterations in benchmarks:
+        if args.only and name not in args.only:
+            continue
+        results.append(run_benchmark(name, func, iterations))
+        print(format_row(results[-1]), flush=True)
+    bank.close()
+    return results
+
+
+def format_row(result: dict) -> str:
+    return (
+        f"{result['name']:>22} {result['ops_per_sec']:12,.0f} "
+        f"{result['p50_us']:10,.0f} {result['p95_us']:10,.0f} "
+        f"{result['p99_us']:10,.0f} {result['peak_kib']:10,.0f}"
+    )
+
+
+def compare(results: List[dict], baseline_path: str, threshold: float) -> bool:
+    """Print throughput changes against a saved run; False on regression"""
+    with open(baseline_path) as file:
+        baseline: Dict[str, dict] = {r["name"]: r for r in json.load(file)["results"]}
+
+    ok = True
+    print(f"\n{'benchmark':>22} {'baseline':>12} {'current':>12} {'change':>8}")
+    for result in results:
+        old = baseline.get(result["name"])
+        if old is None:
+            continue
+        change = result["ops_per_sec"] / old["ops_per_sec"] - 1
+        flag = ""
+        if change < -threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(
+            f"{result['name']:>22} {old['ops_per_sec']:12,.0f} "
+            f"{result['ops_per_sec']:12,.0f} {change:+8.1%}{flag}"
+        )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark core banking operations on a synthetic bank"
+    )
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--accounts-per-user", type=int, default=2)
+    parser.add_argument("--transactions", type=int, default=50, help="per account")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--io-iterations", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=["json", "binary"], default="json")
+    parser.add_argument(
+        "--no-journal",
+        dest="journal",
+        action="store_false",
+        help="rewrite the data file on every change",
+    )
+    parser.add_argument(
+        "--fsync", choices=["always", "interval", "never"], default="always"
+    )
+    parser.add_argument(
+        "--write-behind",
+        action="store_true",
+        help="commit snapshots in groups on a background thread",
+    )
+    parser.add_argument(
+        "--sqlite", action="store_true", help="use the SQLite storage backend"
+    )
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="throughput drop treated as a regression (default 10%%)",
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'benchmark':>22} {'ops/sec':>12} {'p50 us':>10} {'p95 us':>10} "
+        f"{'p99 us':>10} {'peak KiB':>10}"
+    )
+    # Hash with the fixture's cheap settings so login and register_user
+    # measure the bank rather than the KDF
+    passwords.configure(**FIXTURE_KDF)
+    with tempfile.TemporaryDirectory() as directory:
+        results = run_suite(directory, args)
+
+    report = {
+        "created": datetime.datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "compare", "threshold")
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.compare and not compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import datetime
+import os
+import tempfile
+import timeit
+import uuid
+
+import snapshot
+from bank_system import BankSystem
+from benchmarks.common import build_bank, time_call
+from transaction import Transaction, new_transaction_id
+
+
+def from_dict_via_init(data: dict) -> Transaction:
+    """The old from_dict: build through __init__, then overwrite id and time"""
+    transaction = Transaction(
+        data["type"], data["amount"], data["from_account"], data.get("to_account")
+    )
+    transaction.transaction_id = data["transaction_id"]
+    transaction.timestamp = datetime.datetime.fromisoformat(data["timestamp"])
+    return transaction
+
+
+def rate(func, number: int) -> float:
+    """Calls per second, best of three"""
+    return number / min(timeit.repeat(func, number=number, repeat=3))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Transaction id, creation, restore and load throughput"
+    )
+    parser.add_argument("--number", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    n = args.number
+    data = Transaction("transfer", 12.5, "10000", "10001").to_dict()
+    for name, func in (
+        ("uuid4 id", lambda: str(uuid.uuid4())),
+        ("monotonic id", new_transaction_id),
+        ("Transaction()", lambda: Transaction("deposit", 1.0, "10000")),
+        ("from_dict via __init__", lambda: from_dict_via_init(data)),
+        ("from_dict", lambda: Transaction.from_dict(data)),
+    ):
+        print(f"{name:>24}: {rate(func, n):12,.0f} /sec")
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = os.path.join(directory, "bank_data.json")
+        binary_file = os.path.join(directory, "bank_data.bin")
+        bank = build_bank(json_file, args.users, 2, args.transactions)
+        count = sum(len(a.transactions) for a in bank.accounts.values())
+        snapshot.convert(json_file, binary_file, "binary")
+        for name, path in (("json", json_file), ("binary", binary_file)):
+            seconds = min(time_call(lambda: BankSystem(path), args.repeat))
+            print(
+                f"{'load_from_file ' + name:>24}: {count / seconds:12,.0f} "
+                f"transactions/sec ({seconds * 1000:.0f} ms)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import datetime
+import random
+import time
+
+import velocity
+from bank_account import BankAccount
+from transaction import Transaction
+from velocity import Rule
+
+RULES = [
+    Rule("10 withdrawals per hour", 3600, max_count=10),
+    Rule("$5,000 per hour", 3600, max_amount=5000),
+    Rule("$20,000 per day", 24 * 3600, max_amount=20000),
+]
+
+
+def make_account(history: int, rng: random.Random) -> BankAccount:
+    """An account with history outgoing transactions over the last 30 days"""
+    account = BankAccount("10000", 1)
+    account.balance = 1e12
+    now = datetime.datetime.now()
+    offsets = sorted((rng.uniform(0, 30 * 86400) for _ in range(history)), reverse=True)
+    for offset in offsets:
+        transaction = Transaction("withdraw", round(rng.uniform(1, 50), 2), "10000")
+        transaction.timestamp = now - datetime.timedelta(seconds=offset)
+        account.transactions.append(transaction)
+    return account
+
+
+def naive_violation(account: BankAccount, amount: float):
+    """Scan the whole history for every rule"""
+    now = datetime.datetime.now()
+    for rule in RULES:
+        since = now - datetime.timedelta(seconds=rule.window)
+        count, total = 0, 0.0
+        for transaction in account.transactions:
+            if transaction.type in rule.kinds and transaction.timestamp > since:
+                count += 1
+                total += transaction.amount
+        if rule.max_count is not None and count + 1 > rule.max_count:
+            return rule.name
+        if rule.max_amount is not None and total + amount > rule.max_amount:
+            return rule.name
+    return None
+
+
+def per_check(func, checks: int) -> float:
+    """Microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(checks):
+        func()
+    return (time.perf_counter() - start) / checks * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Velocity checks: history scan vs sliding-window counters"
+    )
+    parser.add_argument(
+        "--history", type=int, nargs="+", default=[100, 1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--checks", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    velocity.configure(RULES)
+    print(f"{'history':>9} {'scan us':>10} {'window us':>10}")
+    for history in args.history:
+        account = make_account(history, rng)
+        naive_checks = max(1, min(args.checks, 2_000_000 // max(history, 1)))
+        naive = per_check(lambda: naive_violation(account, 10.0), naive_checks)
+        velocity.check(account, "withdraw", 10.0)  # builds the windows once
+        windowed = per_check(
+            lambda: velocity.check(account, "withdraw", 10.0), args.checks
+        )
+        print(f"{history:>9,} {naive:>10.1f} {windowed:>10.2f}")
+    velocity.disable()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import json
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def convert_amount(amount: float, rate: float) -> float:
+    """Apply a rate, rounding converted amounts to cents.
+
+    A small enough amount converts to 0; callers refuse to move it.
+    """
+    return amount if rate == 1.0 else round(amount * rate, 2)
+
+
+class RateProvider:
+    """Source of exchange rates, quoted as units of each currency per base"""
+
+    def fetch(self) -> Tuple[str, Dict[str, float]]:
+        """Return (base currency, {currency: units per one base unit})"""
+        raise NotImplementedError
+
+
+class FileRateProvider(RateProvider):
+    """Rates from a JSON file: {"base": "USD", "rates": {"EUR": 0.92, ...}}"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self) -> Tuple[str, Dict[str, float]]:
+        """Read the file; ValueError if any rate is not a positive number"""
+        with open(self.path) as file:
+            data = json.load(file)
+        rates = {}
+        for currency, rate in data["rates"].items():
+            if isinstance(rate, bool) or not isinstance(rate, (int, float, str)):
+                raise ValueError(f"Invalid rate for {currency}: {rate!r}")
+            rate = float(rate)
+            if not (math.isfinite(rate) and rate > 0):
+                raise ValueError(f"Invalid rate for {currency}: {rate}")
+            rates[currency] = rate
+        rates[data["base"]] = 1.0
+        return data["base"], rates
+
+
+class StaticRateProvider(RateProvider):
+    def __init__(self, base: str, rates: Dict[str, float]):
+        self.base = base
+        self.rates = dict(rates, **{base: 1.0})
+
+    def fetch(self) -> Tuple[str, Dict[str, float]]:
+        return self.base, dict(self.rates)
+
+
+class RateTable:
+    """In-memory cross rates for every currency pair.
+
+    Rates are fetched once up front and then refreshed in the background
+    every ttl seconds; until a refresh lands the previous rates stay in use,
+    so rate() is always a single dict lookup.
+    """
+
+    def __init__(self, provider: RateProvider, ttl: float = 300.0):
+        self.provider = provider
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._cross: Dict[Tuple[str, str], float] = {}
+        self._expires = 0.0
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Fetch rates now and precompute every cross rate"""
+        base, rates = self.provider.fetch()
+        cross = {
+            (src, dst): rates[dst] / rates[src]
+            for src in rates
+            for dst in rates
+            if rates[src] > 0
+        }
+        with self._lock:
+            self._cross = cross
+            self._expires = time.monotonic() + self.ttl
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error refreshing exchange rates: {e}")
+            with self._lock:
+                self._expires = time.monotonic() + self.ttl
+        finally:
+            self._refreshing = False
+
+    def rate(self, src: str, dst: str) -> Optional[float]:
+        """Units of dst per unit of src, or None if either is unknown"""
+        if src == dst:
+            return 1.0
+        if time.monotonic() >= self._expires and not self._refreshing:
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(
+                    target=self._refresh_in_background, daemon=True
+                ).start()
+        return self._cross.get((src, dst))
+
+    def currencies(self) -> List[str]:
+        return sorted({src for src, _ in self._cross})
+
+    def convert(self, amount: float, src: str, dst: str) -> Optional[float]:
+        rate = self.rate(src, dst)
+        return None if rate is None else convert_amount(amount, rate)
+
+    def convert_many(
+        self, amounts: Iterable[Tuple[float, str]], target: str
+    ) -> List[float]:
+        """Convert (amount, currency) pairs, looking each currency up once"""
+        rates: Dict[str, float] = {}
+        converted = []
+        for amount, currency in amounts:
+            rate = rates.get(currency)
+            if rate is None:
+                rate = rates[currency] = self._required_rate(currency, target)
+            converted.append(amount * rate)
+        return converted
+
+    def convert_totals(self, totals: Dict[str, float], target: str) -> float:
+        """Sum per-currency totals into one amount in target"""
+        return sum(
+            amount * self._required_rate(currency, target)
+            for currency, amount in totals.items()
+        )
+
+    def _required_rate(self, src: str, dst: str) -> float:
+        rate = self.rate(src, dst)
+        if rate is None:
+            raise ValueError(f"No exchange rate from {src} to {dst}")
+        return rate
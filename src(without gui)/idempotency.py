@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+
+def scope_key(key: Optional[str], operation: str, account_number: str) -> Optional[str]:
+    """Tie a client key to one operation on one account.
+
+    Different users, accounts or operations may then pick the same key
+    without one being answered with another's result.
+    """
+    if key is None:
+        return None
+    return f"{operation}:{account_number}:{key}"
+
+
+class IdempotencyCache:
+    """Results of money-moving operations by client-supplied key.
+
+    A retried request with a key that is already here gets the original
+    result back without being applied again. Keys expire ttl seconds after
+    they were first used; beyond max_entries the least recently used key is
+    evicted. Expiry times are wall-clock so they survive a restart.
+    """
+
+    def __init__(self, ttl: float = 24 * 60 * 60, max_entries: int = 100_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> (result, expires); least recently used first
+        self._entries: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()
+
+    def get(self, key: Optional[str]) -> Optional[bool]:
+        """The recorded result for key, or None if it is new or expired"""
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, result: bool, expires: Optional[float] = None) -> float:
+        """Record the result for key; return when it expires"""
+        if expires is None:
+            expires = time.time() + self.ttl
+        with self._lock:
+            self._entries[key] = (result, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return expires
+
+    def entries(self) -> List[list]:
+        """Unexpired [key, result, expires] triples, least recently used first"""
+        now = time.time()
+        with self._lock:
+            return [
+                [key, result, expires]
+                for key, (result, expires) in self._entries.items()
+                if expires > now
+            ]
+
+    def load(self, entries: Iterable[list]) -> None:
+        """Replace the contents with triples from entries()"""
+        with self._lock:
+            self._entries.clear()
+        for key, result, expires in entries:
+            if expires > time.time():
+                self.put(key, result, expires)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,210 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Latencies are bucketed by powers of two microseconds: bucket 0 holds calls
+# under 1us, bucket i holds [2**(i-1), 2**i) us, the last one everything above
+BUCKETS = 32
+
+_enabled = False
+_profile_every = 0
+_lock = threading.Lock()
+_stats: Dict[str, "OperationStats"] = {}
+_profiles: Dict[str, pstats.Stats] = {}
+# cProfile cannot run nested or in several threads at once
+_profile_lock = threading.Lock()
+
+
+class OperationStats:
+    """Call count and latency histogram of one instrumented operation"""
+
+    __slots__ = ("count", "errors", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def record(self, seconds: float, failed: bool) -> None:
+        self.count += 1
+        self.errors += failed
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(BUCKETS - 1, int(seconds * 1e6).bit_length())] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound, in seconds, of the bucket holding the percentile"""
+        rank = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return min(self.max, (1 << i) / 1e6)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": self.total * 1e3,
+            "mean_us": self.total / self.count * 1e6 if self.count else 0.0,
+            "min_us": self.min * 1e6 if self.count else 0.0,
+            "max_us": self.max * 1e6,
+            "p50_us": self.percentile(0.50) * 1e6,
+            "p95_us": self.percentile(0.95) * 1e6,
+            "p99_us": self.percentile(0.99) * 1e6,
+            "histogram_us": {
+                (f"<{1 << i}" if i < BUCKETS - 1 else f">={1 << (i - 1)}"): n
+                for i, n in enumerate(self.buckets)
+                if n
+            },
+        }
+
+
+def enable(profile_every: int = 0) -> None:
+    """Start recording; with profile_every=N every Nth call is run under cProfile"""
+    global _enabled, _profile_every
+    _profile_every = profile_every
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    """Forget everything recorded so far"""
+    with _lock:
+        _stats.clear()
+        _profiles.clear()
+
+
+def record(name: str, seconds: float, failed: bool = False) -> None:
+    """Add one timed call of an operation"""
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = OperationStats()
+        stats.record(seconds, failed)
+
+
+def timed(name: str) -> Callable:
+    """Decorator recording the latency of every call while enabled.
+
+    When disabled the wrapper costs one global lookup before calling through.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+
+            stats = _stats.get(name)
+            if (
+                _profile_every
+                and stats is not None
+                and stats.count % _profile_every == 0
+                and _profile_lock.acquire(blocking=False)
+            ):
+                return _profiled(name, func, args, kwargs)
+
+            failed = True
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                record(name, time.perf_counter() - start, failed)
+
+        return wrapper
+
+    return decorator
+
+
+def _profiled(name: str, func: Callable, args, kwargs):
+    """Run one call under cProfile; _profile_lock is held by the caller"""
+    profiler = cProfile.Profile()
+    failed = True
+    start = time.perf_counter()
+    try:
+        result = profiler.runcall(func, *args, **kwargs)
+        failed = False
+        return result
+    finally:
+        record(name, time.perf_counter() - start, failed)
+        with _lock:
+            if name in _profiles:
+                _profiles[name].add(profiler)
+            else:
+                _profiles[name] = pstats.Stats(profiler)
+        _profile_lock.release()
+
+
+def snapshot() -> Dict[str, dict]:
+    """Return the statistics of every operation recorded so far"""
+    with _lock:
+        return {name: stats.to_dict() for name, stats in sorted(_stats.items())}
+
+
+def profile_stats(name: str) -> Optional[pstats.Stats]:
+    """Return the accumulated cProfile samples of an operation, if any"""
+    with _lock:
+        return _profiles.get(name)
+
+
+def format_report(profile_lines: int = 10) -> str:
+    """Render the statistics (and profile samples) as a text table"""
+    lines: List[str] = [
+        f"{'operation':<28} {'count':>8} {'errors':>6} {'mean us':>10} "
+        f"{'p50 us':>10} {'p95 us':>10} {'p99 us':>10} {'max us':>10}"
+    ]
+    for name, stats in snapshot().items():
+        lines.append(
+            f"{name:<28} {stats['count']:>8} {stats['errors']:>6} "
+            f"{stats['mean_us']:>10.0f} {stats['p50_us']:>10.0f} "
+            f"{stats['p95_us']:>10.0f} {stats['p99_us']:>10.0f} "
+            f"{stats['max_us']:>10.0f}"
+        )
+
+    with _lock:
+        profiles = dict(_profiles)
+    for name, stats in sorted(profiles.items()):
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(profile_lines)
+        lines.append(f"\n--- profile samples: {name} ---")
+        lines.append(out.getvalue().strip())
+    return "\n".join(lines)
+
+
+def dump(path: str) -> None:
+    """Write the statistics as JSON"""
+    with open(path, "w") as file:
+        json.dump(snapshot(), file, indent=2)
+
+
+# BANK_INSTRUMENT=1 turns recording on at startup; a larger value also
+# profiles every Nth call of each operation
+if os.environ.get("BANK_INSTRUMENT"):
+    _every = int(os.environ["BANK_INSTRUMENT"])
+    if _every:
+        enable(_every if _every > 1 else 0)
@@ -0,0 +1,180 @@
+import glob
+import json
+import os
+import threading
+import time
+from typing import Iterator, List, Optional, TextIO, Tuple
+
+from instrumentation import timed
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+class Journal:
+    def __init__(
+        self, path: str, fsync_policy: str = "always", fsync_interval: float = 1.0
+    ):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+
+        self.path = path
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self._file: Optional[TextIO] = None
+        self._last_sync = time.monotonic()
+        # Records written and records known to be on disk; one fsync covers
+        # every record written before it, so concurrent writers share it
+        self._written = 0
+        self._synced = 0
+        self._write_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        # Under the interval policy a timer syncs records that no later
+        # write gets around to syncing, so the loss window stays bounded
+        self._timer: Optional[threading.Timer] = None
+        self._timer_lock = threading.Lock()
+        # Set once a torn tail left by a crash has been cut off
+        self._repaired = False
+
+    def append(self, record: dict) -> None:
+        """Append one compact record and apply the fsync policy"""
+        self.wait_durable(self.write(record))
+
+    def write(self, record: dict) -> int:
+        """Write a record without waiting for the disk; return its position"""
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._write_lock:
+            if self._file is None:
+                if not self._repaired:
+                    self.repair()
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+            self._written += 1
+            return self._written
+
+    def wait_durable(self, position: int) -> None:
+        """Apply the fsync policy to everything up to position"""
+        if self.fsync_policy == "never" or self._synced >= position:
+            return
+        if self.fsync_policy == "interval":
+            elapsed = time.monotonic() - self._last_sync
+            if elapsed < self.fsync_interval:
+                self._schedule_sync(self.fsync_interval - elapsed)
+                return
+        self.sync()
+
+    def _schedule_sync(self, delay: float) -> None:
+        with self._timer_lock:
+            if self._timer is None:
+                self._timer = threading.Timer(delay, self._timed_sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_sync(self) -> None:
+        with self._timer_lock:
+            self._timer = None
+        self.sync()
+
+    @timed("journal.fsync")
+    def sync(self) -> None:
+        """Force appended records to stable storage"""
+        with self._sync_lock:
+            target = self._written
+            if self._synced >= target:
+                return
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+            self._synced = target
+            self._last_sync = time.monotonic()
+
+    def segments(self) -> List[str]:
+        """Return rotated segment files, oldest first"""
+        rotated = glob.glob(glob.escape(self.path) + ".*")
+        return sorted(
+            (p for p in rotated if p.rsplit(".", 1)[1].isdigit()),
+            key=lambda p: int(p.rsplit(".", 1)[1]),
+        )
+
+    def rotate(self, last_seq: int) -> None:
+        """Seal the active file as a segment ending at last_seq"""
+        self.close()
+        if os.path.exists(self.path):
+            os.replace(self.path, f"{self.path}.{last_seq}")
+        self._repaired = True
+
+    def discard_through(self, seq: int) -> None:
+        """Delete sealed segments whose records are all covered by a snapshot"""
+        for segment in self.segments():
+            if int(segment.rsplit(".", 1)[1]) <= seq:
+                os.remove(segment)
+
+    def replay(self) -> Iterator[dict]:
+        """Yield journal records in the order they were appended"""
+        for path in self.segments():
+            for record, _ in self._read(path):
+                yield record
+        self.repair()
+        if os.path.exists(self.path):
+            for record, _ in self._read(self.path):
+                yield record
+
+    def _read(self, path: str) -> Iterator[Tuple[dict, int]]:
+        """Yield each complete record with the byte offset where it ends"""
+        end = 0
+        with open(path, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    # Torn write from a crash; the record never completed
+                    break
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    break
+                end += len(line)
+                yield record, end
+
+    def repair(self) -> None:
+        """Cut a torn or corrupt tail off the active file.
+
+        Appending after a partial line would merge the next record into it
+        and hide every record written after the crash.
+        """
+        with self._sync_lock:
+            self._repaired = True
+            if self._file is not None or not os.path.exists(self.path):
+                return
+            end = 0
+            for _, end in self._read(self.path):
+                pass
+            if end < os.path.getsize(self.path):
+                with open(self.path, "r+b") as file:
+                    file.truncate(end)
+                    file.flush()
+                    os.fsync(file.fileno())
+
+    def exists(self) -> bool:
+        """Check whether any journal file is present on disk"""
+        return os.path.exists(self.path) or bool(self.segments())
+
+    def truncate(self) -> None:
+        """Discard all records, e.g. after they were folded into a snapshot"""
+        self.close()
+        for segment in self.segments():
+            os.remove(segment)
+        with open(self.path, "w", encoding="utf-8") as file:
+            file.flush()
+            os.fsync(file.fileno())
+        self._repaired = True
+
+    def close(self) -> None:
+        """Sync and close the journal file"""
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        with self._write_lock:
+            if self._file is not None:
+                self.sync()
+                with self._sync_lock:
+                    self._file.close()
+                    self._file = None
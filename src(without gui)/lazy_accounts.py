@@ -0,0 +1,180 @@
+import mmap
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, Iterator, MutableMapping, Optional, Tuple, Union
+
+import snapshot
+from user import User
+from bank_account import BankAccount
+
+
+class LazyAccountMap(MutableMapping):
+    """Accounts backed by a memory-mapped binary snapshot.
+
+    Only the account index is read up front. An account is decoded the first
+    time it is looked up and kept in an LRU of at most max_resident clean
+    accounts. Accounts that were created or changed since the snapshot are
+    pinned in memory until a new snapshot containing them is in place.
+
+    An account number resolves to the same object for as long as anyone
+    holds it, even after it leaves the LRU, so callers never end up with
+    two copies that have separate locks and overwrite each other.
+    """
+
+    def __init__(self, path: str, max_resident: int = 1024):
+        self.path = path
+        self.max_resident = max_resident
+        self._lock = threading.RLock()
+        self._buf: Optional[memoryview] = None
+        self._index: Dict[str, snapshot.IndexEntry] = {}
+        self._resident: "OrderedDict[str, BankAccount]" = OrderedDict()
+        self._pinned: Dict[str, BankAccount] = {}
+        # Captured by a checkpoint that is still being written
+        self._pending: Dict[str, BankAccount] = {}
+        # Every account handed out that is still referenced somewhere
+        self._live: "weakref.WeakValueDictionary[str, BankAccount]" = (
+            weakref.WeakValueDictionary()
+        )
+        self._open()
+
+    def _open(self) -> None:
+        with open(self.path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        # The old mapping is released once nothing references its blocks
+        self._buf = memoryview(mapped)
+        entries = snapshot.read_index(self._buf, snapshot.read_index_offset(self._buf))
+        self._index = {entry[0]: entry for entry in entries}
+
+    def read_header(self) -> Tuple[dict, Dict[int, User]]:
+        """Decode the snapshot's meta and users from the mapping"""
+        meta, users, _ = snapshot.read_header(self._buf)
+        return meta, users
+
+    def __getitem__(self, account_number: str) -> BankAccount:
+        with self._lock:
+            account = self._pinned.get(account_number) or self._pending.get(
+                account_number
+            )
+            if account is not None:
+                return account
+
+            account = self._resident.get(account_number)
+            if account is not None:
+                self._resident.move_to_end(account_number)
+                return account
+
+            account = self._live.get(account_number)
+            if account is None:
+                entry = self._index[account_number]
+                account = snapshot.decode_account(self._buf, entry)
+                self._live[account_number] = account
+            self._resident[account_number] = account
+            while len(self._resident) > self.max_resident:
+                self._resident.popitem(last=False)
+            return account
+
+    def __setitem__(self, account_number: str, account: BankAccount) -> None:
+        with self._lock:
+            self._resident.pop(account_number, None)
+            self._pinned[account_number] = account
+            self._live[account_number] = account
+
+    def __delitem__(self, account_number: str) -> None:
+        with self._lock:
+            found = False
+            self._live.pop(account_number, None)
+            for table in (self._index, self._resident, self._pinned, self._pending):
+                if table.pop(account_number, None) is not None:
+                    found = True
+            if not found:
+                raise KeyError(account_number)
+
+    def __contains__(self, account_number) -> bool:
+        return (
+            account_number in self._index
+            or account_number in self._pinned
+            or account_number in self._pending
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            keys = list(self._index)
+            keys.extend(
+                k for k in (*self._pending, *self._pinned) if k not in self._index
+            )
+        return iter(dict.fromkeys(keys))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def mark_dirty(self, account: BankAccount) -> None:
+        """Pin a changed account until the next snapshot contains it"""
+        with self._lock:
+            account_number = account.account_number
+            self._resident.pop(account_number, None)
+            self._pending.pop(account_number, None)
+            self._pinned[account_number] = account
+            self._live[account_number] = account
+
+    def summaries(self) -> Iterator[Tuple[str, int, str]]:
+        """Yield (account_number, user_id, currency) without decoding accounts"""
+        for account_number in self:
+            account = self._pinned.get(account_number) or self._pending.get(
+                account_number
+            )
+            if account is not None:
+                yield account_number, account.user_id, account.currency
+            else:
+                entry = self._index[account_number]
+                yield account_number, entry[1], entry[2]
+
+    def resident_count(self) -> int:
+        """Number of fully materialized accounts currently in memory"""
+        return len(self._resident) + len(self._pinned) + len(self._pending)
+
+    def checkpoint(self) -> Dict[str, Union[BankAccount, snapshot.RawAccount]]:
+        """Capture the current state for writing a new snapshot.
+
+        Changed accounts are copied; unchanged ones are referenced as raw
+        blocks of the current mapping so they never need decoding.
+        """
+        with self._lock:
+            captured = {}
+            for account_number in self:
+                account = self._pinned.get(account_number) or self._pending.get(
+                    account_number
+                )
+                if account is not None:
+                    captured[account_number] = account.copy()
+                else:
+                    captured[account_number] = snapshot.RawAccount.from_entry(
+                        self._buf, self._index[account_number]
+                    )
+            # Keep changed accounts in memory until the new file is mapped
+            self._pending.update(self._pinned)
+            self._pinned = {}
+            return captured
+
+    def finish_checkpoint(self) -> None:
+        """Switch to the freshly written snapshot at self.path"""
+        with self._lock:
+            self._open()
+            for account_number, account in self._pending.items():
+                self._resident[account_number] = account
+            self._pending = {}
+            while len(self._resident) > self.max_resident:
+                self._resident.popitem(last=False)
+
+    @classmethod
+    def from_accounts(
+        cls, path: str, accounts: Dict[str, BankAccount], max_resident: int = 1024
+    ) -> "LazyAccountMap":
+        """Map a snapshot just written from accounts, keeping them resident"""
+        lazy = cls(path, max_resident)
+        for account_number, account in accounts.items():
+            lazy._resident[account_number] = account
+            lazy._live[account_number] = account
+        while len(lazy._resident) > max_resident:
+            lazy._resident.popitem(last=False)
+        return lazy
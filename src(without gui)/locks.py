@@ -0,0 +1,55 @@
+import threading
+from contextlib import ExitStack, contextmanager
+
+
+class SharedLock:
+    """A lock held by many in shared mode or by one in exclusive mode.
+
+    Waiting exclusive holders block new shared holders, so a compaction
+    cannot be starved by a steady stream of transfers.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._shared = 0
+        self._exclusive = False
+        self._waiting = 0
+
+    @contextmanager
+    def shared(self):
+        with self._condition:
+            while self._exclusive or self._waiting:
+                self._condition.wait()
+            self._shared += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._shared -= 1
+                if not self._shared:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._condition:
+            self._waiting += 1
+            while self._exclusive or self._shared:
+                self._condition.wait()
+            self._waiting -= 1
+            self._exclusive = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._condition.notify_all()
+
+
+@contextmanager
+def lock_accounts(*accounts):
+    """Hold the locks of several accounts, always taken in account order"""
+    unique = {a.account_number: a for a in accounts if a is not None}
+    with ExitStack() as stack:
+        for account_number in sorted(unique):
+            stack.enter_context(unique[account_number].lock)
+        yield
@@ -0,0 +1,138 @@
+import hashlib
+import hmac
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+
+# Hashes are stored with their parameters so each user keeps the settings
+# they were hashed with:
+#   scrypt$<n>$<r>$<p>$<salt hex>$<hash hex>
+#   pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>
+# A bare 64-digit hex string is a legacy unsalted SHA-256 hash.
+ALGORITHMS = ("scrypt", "pbkdf2_sha256")
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+if hasattr(hashlib, "scrypt"):
+    DEFAULT_PARAMS = {"algorithm": "scrypt", "n": 2**14, "r": 8, "p": 1}
+else:
+    DEFAULT_PARAMS = {"algorithm": "pbkdf2_sha256", "iterations": 600_000}
+
+_params = dict(DEFAULT_PARAMS)
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def configure(**params) -> None:
+    """Set the KDF parameters used for new hashes and rehash upgrades"""
+    global _params
+    if params.get("algorithm") not in ALGORITHMS:
+        raise ValueError(f"Unknown password algorithm: {params.get('algorithm')}")
+    _params = params
+
+
+def current_params() -> dict:
+    return dict(_params)
+
+
+@contextmanager
+def using(**params):
+    """Temporarily hash with other parameters (e.g. cheap ones for fixtures)"""
+    previous = _params
+    configure(**params)
+    try:
+        yield
+    finally:
+        configure(**previous)
+
+
+def start_pool(workers: Optional[int] = None) -> None:
+    """Hash in a process pool so logins scale across cores"""
+    global _pool
+    stop_pool()
+    # Workers start on first submit from the server's threads; forking then
+    # could copy locks held by other threads, so use a clean interpreter
+    methods = multiprocessing.get_all_start_methods()
+    method = "forkserver" if "forkserver" in methods else "spawn"
+    _pool = ProcessPoolExecutor(
+        workers or os.cpu_count() or 1, mp_context=multiprocessing.get_context(method)
+    )
+
+
+def stop_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def _derive(password: str, salt: bytes, params: dict) -> bytes:
+    if params["algorithm"] == "scrypt":
+        return hashlib.scrypt(
+            password.encode(),
+            salt=salt,
+            n=params["n"],
+            r=params["r"],
+            p=params["p"],
+            maxmem=256 * params["n"] * params["r"] + 1024 * 1024,
+            dklen=HASH_BYTES,
+        )
+    return hashlib.pbkdf2_hmac(
+        "sha256", password.encode(), salt, params["iterations"], HASH_BYTES
+    )
+
+
+def _encode(params: dict, salt: bytes, digest: bytes) -> str:
+    if params["algorithm"] == "scrypt":
+        fields = [params["n"], params["r"], params["p"]]
+    else:
+        fields = [params["iterations"]]
+    return "$".join([params["algorithm"], *map(str, fields), salt.hex(), digest.hex()])
+
+
+def _decode(stored: str) -> Optional[tuple]:
+    """Split a stored hash into (params, salt, digest); None if legacy"""
+    parts = stored.split("$")
+    if parts[0] == "scrypt" and len(parts) == 6:
+        n, r, p = map(int, parts[1:4])
+        params = {"algorithm": "scrypt", "n": n, "r": r, "p": p}
+    elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+        params = {"algorithm": "pbkdf2_sha256", "iterations": int(parts[1])}
+    else:
+        return None
+    return params, bytes.fromhex(parts[-2]), bytes.fromhex(parts[-1])
+
+
+def _hash(password: str, params: dict) -> str:
+    salt = os.urandom(SALT_BYTES)
+    return _encode(params, salt, _derive(password, salt, params))
+
+
+def _verify(password: str, stored: str) -> bool:
+    decoded = _decode(stored)
+    if decoded is None:
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored)
+    params, salt, digest = decoded
+    return hmac.compare_digest(_derive(password, salt, params), digest)
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with a fresh salt and the current parameters"""
+    if _pool is not None:
+        return _pool.submit(_hash, password, _params).result()
+    return _hash(password, _params)
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """Check a password against a stored hash of any supported kind"""
+    if _pool is not None and _decode(stored) is not None:
+        return _pool.submit(_verify, password, stored).result()
+    return _verify(password, stored)
+
+
+def needs_rehash(stored: str) -> bool:
+    """True for legacy hashes and hashes made with other parameters"""
+    decoded = _decode(stored)
+    return decoded is None or decoded[0] != _params
@@ -0,0 +1,230 @@
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from transaction_store import EPOCH, TYPE_NAMES, account_ref, to_micros
+
+DAY = 86_400_000_000  # microseconds
+
+
+class _Column:
+    """Growable NumPy column with amortized O(1) appends"""
+
+    def __init__(self, dtype):
+        self.data = np.empty(1024, dtype)
+        self.size = 0
+
+    def extend(self, values: np.ndarray) -> None:
+        needed = self.size + len(values)
+        if needed > len(self.data):
+            grown = np.empty(max(needed, 2 * len(self.data)), self.data.dtype)
+            grown[: self.size] = self.data[: self.size]
+            self.data = grown
+        self.data[self.size : needed] = values
+        self.size = needed
+
+    def view(self) -> np.ndarray:
+        return self.data[: self.size]
+
+
+class ReportingEngine:
+    """Bank-wide analytics over NumPy columns of every transaction.
+
+    refresh() copies transactions that were added since the last call from
+    each account's TransactionStore; every report is then a handful of
+    vectorized group-bys. A transfer is stored once per side; volume counts
+    only the sending side, turnover counts both.
+    """
+
+    def __init__(self, bank_system):
+        self.bank_system = bank_system
+        self._amount = _Column(np.float64)
+        self._stamp = _Column(np.int64)
+        self._type = _Column(np.uint8)
+        self._account = _Column(np.int32)  # index into _account_numbers
+        self._outgoing = _Column(np.bool_)  # sending side of a transfer
+        self._account_numbers: List[str] = []
+        self._account_index: Dict[str, int] = {}
+        self._account_currency = _Column(np.int32)  # index into _currencies
+        self._currencies: List[str] = []
+        self._exported: Dict[str, int] = {}
+
+    def refresh(self) -> int:
+        """Export transactions added since the last refresh; return how many"""
+        added = 0
+        accounts = self.bank_system.accounts
+        for account_number in list(accounts):
+            account = accounts[account_number]
+            start = self._exported.get(account_number, 0)
+            with account.lock:
+                store = account.transactions
+                end = len(store)
+                if end == start:
+                    continue
+                # Slices copy, so no buffer of the live columns stays exported
+                amounts = store._amounts[start:end]
+                stamps = store._stamps[start:end]
+                types = store._types[start:end]
+                senders = store._from[start:end]
+
+            index = self._account_index.get(account_number)
+            if index is None:
+                index = self._add_account(account_number, account.currency)
+            types = np.frombuffer(types, np.uint8)
+            self._amount.extend(np.frombuffer(amounts, np.float64))
+            self._stamp.extend(np.frombuffer(stamps, np.int64))
+            self._type.extend(types)
+            self._account.extend(np.full(end - start, index, np.int32))
+            self._outgoing.extend(
+                (types == 2)
+                & (np.frombuffer(senders, np.int32) == account_ref(account_number))
+            )
+            self._exported[account_number] = end
+            added += end - start
+        return added
+
+    def _add_account(self, account_number: str, currency: str) -> int:
+        index = len(self._account_numbers)
+        self._account_numbers.append(account_number)
+        self._account_index[account_number] = index
+        if currency not in self._currencies:
+            self._currencies.append(currency)
+        self._account_currency.extend(
+            np.array([self._currencies.index(currency)], np.int32)
+        )
+        return index
+
+    def __len__(self) -> int:
+        return self._amount.size
+
+    def _select(
+        self,
+        start: Optional[datetime.datetime],
+        end: Optional[datetime.datetime],
+        currency: Optional[str],
+        volume_only: bool = False,
+    ) -> np.ndarray:
+        """Boolean mask of rows in [start, end) and the given currency"""
+        mask = np.ones(len(self), np.bool_)
+        if start is not None:
+            mask &= self._stamp.view() >= to_micros(start)
+        if end is not None:
+            mask &= self._stamp.view() < to_micros(end)
+        if currency is not None:
+            if currency not in self._currencies:
+                return np.zeros(len(self), np.bool_)
+            currencies = self._account_currency.view()
+            mask &= currencies[self._account.view()] == self._currencies.index(currency)
+        if volume_only:
+            # Count each transfer once, on its sending side
+            mask &= (self._type.view() != 2) | self._outgoing.view()
+        return mask
+
+    def daily_volume(
+        self,
+        currency: Optional[str] = None,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+    ) -> Dict[datetime.date, Tuple[int, float]]:
+        """(count, amount) of transactions per day"""
+        mask = self._select(start, end, currency, volume_only=True)
+        days = self._stamp.view()[mask] // DAY
+        amounts = self._amount.view()[mask]
+        unique, inverse = np.unique(days, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(unique))
+        totals = np.bincount(inverse, weights=amounts, minlength=len(unique))
+        base = EPOCH.date()
+        return {
+            base + datetime.timedelta(days=int(day)): (int(count), float(total))
+            for day, count, total in zip(unique, counts, totals)
+        }
+
+    def type_breakdown(
+        self,
+        currency: Optional[str] = None,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+    ) -> Dict[str, Tuple[int, float]]:
+        """(count, amount) per transaction type"""
+        mask = self._select(start, end, currency, volume_only=True)
+        types = self._type.view()[mask]
+        counts = np.bincount(types, minlength=len(TYPE_NAMES))
+        totals = np.bincount(
+            types, weights=self._amount.view()[mask], minlength=len(TYPE_NAMES)
+        )
+        return {
+            name: (int(counts[code]), float(totals[code]))
+            for code, name in enumerate(TYPE_NAMES)
+        }
+
+    def currency_totals(
+        self,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+    ) -> Dict[str, Dict[str, Tuple[int, float]]]:
+        """Type breakdown per currency"""
+        mask = self._select(start, end, None, volume_only=True)
+        currencies = self._account_currency.view()
+        groups = (
+            currencies[self._account.view()[mask]] * len(TYPE_NAMES)
+            + self._type.view()[mask]
+        )
+        size = len(self._currencies) * len(TYPE_NAMES)
+        counts = np.bincount(groups, minlength=size)
+        totals = np.bincount(groups, weights=self._amount.view()[mask], minlength=size)
+        return {
+            currency: {
+                name: (
+                    int(counts[c * len(TYPE_NAMES) + code]),
+                    float(totals[c * len(TYPE_NAMES) + code]),
+                )
+                for code, name in enumerate(TYPE_NAMES)
+            }
+            for c, currency in enumerate(self._currencies)
+        }
+
+    def total_volume(
+        self,
+        target: str,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+    ) -> float:
+        """Volume across every currency, converted into target"""
+        mask = self._select(start, end, None, volume_only=True)
+        fx_rates = self.bank_system.fx_rates
+        factors = np.empty(len(self._currencies), np.float64)
+        for c, currency in enumerate(self._currencies):
+            rate = 1.0 if currency == target else None
+            if rate is None and fx_rates is not None:
+                rate = fx_rates.rate(currency, target)
+            if rate is None:
+                raise ValueError(f"No exchange rate from {currency} to {target}")
+            factors[c] = rate
+        currencies = self._account_currency.view()[self._account.view()[mask]]
+        return float(np.dot(self._amount.view()[mask], factors[currencies]))
+
+    def top_accounts(
+        self,
+        n: int = 10,
+        currency: Optional[str] = None,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+    ) -> List[Tuple[str, float]]:
+        """The n accounts with the highest turnover (money in plus out)"""
+        mask = self._select(start, end, currency)
+        turnover = np.bincount(
+            self._account.view()[mask],
+            weights=self._amount.view()[mask],
+            minlength=len(self._account_numbers),
+        )
+        n = min(n, len(turnover))
+        if n == 0:
+            return []
+        top = np.argpartition(-turnover, n - 1)[:n]
+        top = top[np.argsort(-turnover[top], kind="stable")]
+        return [
+            (self._account_numbers[i], float(turnover[i]))
+            for i in top
+            if turnover[i] > 0
+        ]
@@ -0,0 +1,230 @@
+import datetime
+import heapq
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+CATCH_UP_POLICIES = ("all", "latest")
+
+
+class StandingOrder:
+    """A transfer that runs at next_run and then every interval until until"""
+
+    __slots__ = (
+        "order_id",
+        "from_account",
+        "to_account",
+        "amount",
+        "next_run",
+        "interval",
+        "until",
+    )
+
+    def __init__(
+        self,
+        order_id: int,
+        from_account: str,
+        to_account: str,
+        amount: float,
+        next_run: datetime.datetime,
+        interval: Optional[datetime.timedelta] = None,
+        until: Optional[datetime.datetime] = None,
+    ):
+        self.order_id = order_id
+        self.from_account = from_account
+        self.to_account = to_account
+        self.amount = amount
+        self.next_run = next_run
+        self.interval = interval
+        self.until = until
+
+    def to_dict(self) -> dict:
+        return {
+            "order_id": self.order_id,
+            "from_account": self.from_account,
+            "to_account": self.to_account,
+            "amount": self.amount,
+            "next_run": self.next_run.isoformat(),
+            "interval": self.interval.total_seconds() if self.interval else None,
+            "until": self.until.isoformat() if self.until else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "StandingOrder":
+        return cls(
+            data["order_id"],
+            data["from_account"],
+            data["to_account"],
+            data["amount"],
+            datetime.datetime.fromisoformat(data["next_run"]),
+            (
+                datetime.timedelta(seconds=data["interval"])
+                if data["interval"]
+                else None
+            ),
+            datetime.datetime.fromisoformat(data["until"]) if data["until"] else None,
+        )
+
+
+class Scheduler:
+    """Standing orders with the next due ones on a min-heap.
+
+    Finding due orders costs O(log n) per due order, however many orders
+    exist. Cancelling leaves a stale heap entry behind that is skipped when
+    it surfaces; the heap is rebuilt once stale entries outnumber live ones.
+
+    After downtime, catch_up "all" runs every missed occurrence (at most
+    max_runs_per_tick per order per tick, the rest on later ticks) and
+    "latest" runs a missed order once and skips to its next future run.
+    """
+
+    def __init__(self, catch_up: str = "all", max_runs_per_tick: int = 100):
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"Unknown catch-up policy: {catch_up}")
+        self.catch_up = catch_up
+        self.max_runs_per_tick = max_runs_per_tick
+        self.orders: Dict[int, StandingOrder] = {}
+        self.orders_by_account: Dict[str, Set[int]] = {}
+        self.next_order_id = 1
+        self._heap: List[Tuple[datetime.datetime, int]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def create(
+        self,
+        from_account: str,
+        to_account: str,
+        amount: float,
+        first_run: datetime.datetime,
+        interval: Optional[datetime.timedelta] = None,
+        until: Optional[datetime.datetime] = None,
+    ) -> StandingOrder:
+        with self._lock:
+            order = StandingOrder(
+                self.next_order_id,
+                from_account,
+                to_account,
+                amount,
+                first_run,
+                interval,
+                until,
+            )
+            self.next_order_id += 1
+        self.add(order)
+        return order
+
+    def add(self, order: StandingOrder) -> None:
+        with self._lock:
+            self.orders[order.order_id] = order
+            self.orders_by_account.setdefault(order.from_account, set()).add(
+                order.order_id
+            )
+            self.next_order_id = max(self.next_order_id, order.order_id + 1)
+            heapq.heappush(self._heap, (order.next_run, order.order_id))
+
+    def remove(self, order_id: int) -> bool:
+        """Cancel an order; False if there is no such order"""
+        with self._lock:
+            order = self.orders.pop(order_id, None)
+            if order is None:
+                return False
+            owned = self.orders_by_account[order.from_account]
+            owned.discard(order_id)
+            if not owned:
+                del self.orders_by_account[order.from_account]
+            if len(self._heap) > 2 * len(self.orders) + 64:
+                self._rebuild_heap()
+            return True
+
+    def load(self, orders: Iterable[StandingOrder], next_order_id: int = 1) -> None:
+        """Replace every order, building the heap in one pass"""
+        with self._lock:
+            self.orders = {order.order_id: order for order in orders}
+            self.orders_by_account = {}
+            for order in self.orders.values():
+                self.orders_by_account.setdefault(order.from_account, set()).add(
+                    order.order_id
+                )
+            self.next_order_id = max(
+                [next_order_id, *(order_id + 1 for order_id in self.orders)]
+            )
+            self._rebuild_heap()
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [
+            (order.next_run, order.order_id) for order in self.orders.values()
+        ]
+        heapq.heapify(self._heap)
+
+    def for_account(self, account_number: str) -> List[StandingOrder]:
+        """Orders paying out of an account, soonest first"""
+        orders = [
+            self.orders[order_id]
+            for order_id in self.orders_by_account.get(account_number, ())
+        ]
+        return sorted(orders, key=lambda order: (order.next_run, order.order_id))
+
+    def pop_due(
+        self, now: datetime.datetime
+    ) -> List[Tuple[StandingOrder, int, Optional[datetime.datetime]]]:
+        """Take every order due by now off the heap.
+
+        Returns (order, runs, next_run) for each: how many occurrences to
+        execute now and when the order runs next (None once it is done).
+        Each order must be handed back to advance() afterwards.
+        """
+        due = []
+        taken: Set[int] = set()
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                when, order_id = heapq.heappop(heap)
+                order = self.orders.get(order_id)
+                if order is None or order.next_run != when or order_id in taken:
+                    continue  # cancelled, rescheduled or a duplicate entry
+                taken.add(order_id)
+                due.append((order, *self._plan(order, now)))
+        return due
+
+    def _plan(
+        self, order: StandingOrder, now: datetime.datetime
+    ) -> Tuple[int, Optional[datetime.datetime]]:
+        interval = order.interval
+        if interval is None:
+            return 1, None
+
+        missed = (now - order.next_run) // interval + 1
+        if order.until is not None:
+            missed = min(missed, (order.until - order.next_run) // interval + 1)
+        if self.catch_up == "latest":
+            runs = 1
+            # The first occurrence after now, not every one in between
+            next_run = (
+                order.next_run + ((now - order.next_run) // interval + 1) * interval
+            )
+        else:
+            runs = min(missed, self.max_runs_per_tick)
+            next_run = order.next_run + runs * interval
+        if order.until is not None and next_run > order.until:
+            next_run = None
+        return runs, next_run
+
+    def requeue(self, orders: Iterable[StandingOrder]) -> None:
+        """Put orders taken by pop_due back unchanged"""
+        with self._lock:
+            for order in orders:
+                if order.order_id in self.orders:
+                    heapq.heappush(self._heap, (order.next_run, order.order_id))
+
+    def advance(self, order_id: int, next_run: Optional[datetime.datetime]) -> None:
+        """Move an order to its next run, or retire it when next_run is None"""
+        if next_run is None:
+            self.remove(order_id)
+            return
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                return
+            order.next_run = next_run
+            heapq.heappush(self._heap, (next_run, order_id))
@@ -0,0 +1,358 @@
+import argparse
+import asyncio
+import datetime
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import passwords
+import velocity
+from bank_system import BankSystem
+from bank_account import BankAccount
+from fx import FileRateProvider, RateTable
+from user import User
+
+MAX_STATEMENT_LIMIT = 1000
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+class RequestError(Exception):
+    pass
+
+
+class BankServer:
+    """Line-delimited JSON front-end for a BankSystem.
+
+    Each request is one JSON object per line:
+        {"id": 1, "cmd": "deposit", "token": "...", "args": {...}}
+    and gets one response line:
+        {"id": 1, "ok": true, "result": ...} or {"id": 1, "ok": false, "error": "..."}
+
+    deposit, withdraw and transfer take an optional "idempotency_key" in
+    args, so a client can safely resend one after a timeout.
+
+    BankSystem calls (and therefore journal writes and fsyncs) run on a
+    thread pool so the event loop never blocks on disk.
+    """
+
+    def __init__(self, bank_system: BankSystem, workers: int = 32):
+        self.bank_system = bank_system
+        self.executor = ThreadPoolExecutor(workers)
+        self.commands = {
+            "register": self.register,
+            "login": self.login,
+            "logout": self.logout,
+            "accounts": self.accounts,
+            "create_account": self.create_account,
+            "deposit": self.deposit,
+            "withdraw": self.withdraw,
+            "transfer": self.transfer,
+            "statement": self.statement,
+            "schedule_transfer": self.schedule_transfer,
+            "scheduled": self.scheduled,
+            "cancel_scheduled": self.cancel_scheduled,
+        }
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765):
+        """Start listening; return the bound (host, port)"""
+        self._server = await asyncio.start_server(
+            self._serve_client, host, port, limit=MAX_REQUEST_BYTES
+        )
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self) -> None:
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def run_scheduler(self, tick: float = 60.0) -> None:
+        """Execute due standing orders every tick seconds"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(self.executor, self.bank_system.run_due)
+            except Exception as e:
+                # Keep ticking; the orders stay due and are retried next tick
+                print(f"Error running standing orders: {e!r}")
+            await asyncio.sleep(tick)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+    async def _serve_client(self, reader, writer) -> None:
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Longer than MAX_REQUEST_BYTES; the rest of it may still
+                    # be on its way, so answer and hang up rather than parse it
+                    response = {"id": None, "ok": False, "error": "Request too long"}
+                    writer.write(json.dumps(response).encode() + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                response = await self.handle(line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, line: bytes) -> dict:
+        """Decode one request line and run its command off the event loop"""
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            return {"id": None, "ok": False, "error": "Invalid JSON"}
+        if not isinstance(request, dict):
+            return {"id": None, "ok": False, "error": "Request must be an object"}
+
+        request_id = request.get("id")
+        command = self.commands.get(request.get("cmd"))
+        if command is None:
+            return {"id": request_id, "ok": False, "error": "Unknown command"}
+
+        args = request.get("args") or {}
+        if not isinstance(args, dict):
+            return {"id": request_id, "ok": False, "error": "args must be an object"}
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self.executor, command, args, request.get("token")
+            )
+        except RequestError as e:
+            return {"id": request_id, "ok": False, "error": str(e)}
+        except (KeyError, TypeError, ValueError, OverflowError) as e:
+            return {"id": request_id, "ok": False, "error": f"Bad request: {e}"}
+        except Exception as e:
+            # Never let one request take the connection down with it
+            print(f"Error handling {request.get('cmd')}: {e!r}")
+            return {"id": request_id, "ok": False, "error": "Internal error"}
+        return {"id": request_id, "ok": True, "result": result}
+
+    def _new_session(self, user: User) -> dict:
+        token = self.bank_system.sessions.create(user.user_id)
+        return {"token": token, "user_id": user.user_id}
+
+    def _user(self, token: Optional[str]) -> User:
+        user = self.bank_system.session_user(token)
+        if user is None:
+            raise RequestError("Not logged in")
+        return user
+
+    @staticmethod
+    def _amount(args: dict, key: str = "amount") -> float:
+        """A number from args; the bank rejects NaN and infinite amounts"""
+        value = args[key]
+        if isinstance(value, bool):
+            raise RequestError(f"{key} must be a number")
+        return float(value)
+
+    @staticmethod
+    def _text(args: dict, key: str) -> str:
+        """A string from args; rejects numbers, lists and other JSON types"""
+        value = args[key]
+        if not isinstance(value, str):
+            raise RequestError(f"{key} must be a string")
+        return value
+
+    def _own_account(self, user: User, account_number: str) -> BankAccount:
+        account = self.bank_system.get_account(str(account_number))
+        if account is None or account.user_id != user.user_id:
+            raise RequestError("Account not found")
+        return account
+
+    def register(self, args: dict, token: Optional[str]) -> dict:
+        user = self.bank_system.register_user(
+            self._text(args, "full_name"),
+            self._text(args, "phone"),
+            self._text(args, "password"),
+        )
+        if not user:
+            raise RequestError("Phone number already registered")
+        return self._new_session(user)
+
+    def login(self, args: dict, token: Optional[str]) -> dict:
+        user = self.bank_system.login(
+            self._text(args, "phone"), self._text(args, "password")
+        )
+        if not user:
+            raise RequestError("Invalid credentials or account locked")
+        return self._new_session(user)
+
+    def logout(self, args: dict, token: Optional[str]) -> bool:
+        return self.bank_system.logout(token)
+
+    def accounts(self, args: dict, token: Optional[str]) -> list:
+        user = self._user(token)
+        return [
+            {
+                "account_number": account.account_number,
+                "currency": account.currency,
+                "balance": account.balance,
+            }
+            for account in self.bank_system.get_user_accounts(user.user_id)
+        ]
+
+    def create_account(self, args: dict, token: Optional[str]) -> dict:
+        user = self._user(token)
+        account = self.bank_system.create_account(user, args.get("currency", "USD"))
+        return {"account_number": account.account_number}
+
+    def deposit(self, args: dict, token: Optional[str]) -> dict:
+        account = self._own_account(self._user(token), args["account"])
+        if not self.bank_system.deposit(
+            account, self._amount(args), args.get("idempotency_key")
+        ):
+            raise RequestError("Deposit failed")
+        return {"balance": account.balance}
+
+    def withdraw(self, args: dict, token: Optional[str]) -> dict:
+        account = self._own_account(self._user(token), args["account"])
+        if not self.bank_system.withdraw(
+            account, self._amount(args), args.get("idempotency_key")
+        ):
+            raise RequestError("Withdrawal failed")
+        return {"balance": account.balance}
+
+    def transfer(self, args: dict, token: Optional[str]) -> dict:
+        account = self._own_account(self._user(token), args["account"])
+        to_account = self.bank_system.get_account(str(args["to_account"]))
+        if to_account is None:
+            raise RequestError("Destination account not found")
+        if to_account.account_number == account.account_number:
+            raise RequestError("Cannot transfer to the same account")
+        if not self.bank_system.transfer(
+            account, to_account, self._amount(args), args.get("idempotency_key")
+        ):
+            raise RequestError("Transfer failed")
+        return {"balance": account.balance}
+
+    def schedule_transfer(self, args: dict, token: Optional[str]) -> dict:
+        account = self._own_account(self._user(token), args["account"])
+        to_account = self.bank_system.get_account(str(args["to_account"]))
+        if to_account is None:
+            raise RequestError("Destination account not found")
+        interval = args.get("interval")
+        until = args.get("until")
+        order = self.bank_system.schedule_transfer(
+            account,
+            to_account,
+            self._amount(args),
+            datetime.datetime.fromisoformat(args["first_run"]),
+            (
+                datetime.timedelta(seconds=self._amount(args, "interval"))
+                if interval
+                else None
+            ),
+            datetime.datetime.fromisoformat(until) if until else None,
+        )
+        if order is None:
+            raise RequestError("Invalid standing order")
+        return order.to_dict()
+
+    def scheduled(self, args: dict, token: Optional[str]) -> list:
+        account = self._own_account(self._user(token), args["account"])
+        return [
+            order.to_dict() for order in self.bank_system.scheduled_transfers(account)
+        ]
+
+    def cancel_scheduled(self, args: dict, token: Optional[str]) -> bool:
+        user = self._user(token)
+        order = self.bank_system.scheduler.orders.get(int(args["order_id"]))
+        if order is None:
+            raise RequestError("Standing order not found")
+        self._own_account(user, order.from_account)
+        if not self.bank_system.cancel_scheduled(order.order_id):
+            raise RequestError("Standing order not found")
+        return True
+
+    def statement(self, args: dict, token: Optional[str]) -> dict:
+        account = self._own_account(self._user(token), args["account"])
+        start, end = args.get("start"), args.get("end")
+        limit = int(args.get("limit", 20))
+        if not 1 <= limit <= MAX_STATEMENT_LIMIT:
+            raise RequestError(f"limit must be between 1 and {MAX_STATEMENT_LIMIT}")
+        cursor = args.get("cursor")
+        if cursor is not None:
+            cursor = int(cursor)
+            if not 0 <= cursor <= len(account.transactions):
+                raise RequestError("Invalid cursor")
+        lines, cursor = account.get_statement_page(
+            limit,
+            cursor,
+            datetime.datetime.fromisoformat(start) if start else None,
+            datetime.datetime.fromisoformat(end) if end else None,
+        )
+        return {"lines": lines, "cursor": cursor}
+
+
+async def serve(
+    host: str,
+    port: int,
+    data_file: str,
+    fx_rates_file: Optional[str] = None,
+    tick: float = 60.0,
+) -> None:
+    fx_rates = RateTable(FileRateProvider(fx_rates_file)) if fx_rates_file else None
+    bank_system = BankSystem(data_file, journal=True, fx_rates=fx_rates)
+    server = BankServer(bank_system)
+    host, port = await server.start(host, port)
+    print(f"Serving on {host}:{port}", flush=True)
+    scheduler = asyncio.create_task(server.run_scheduler(tick))
+    try:
+        await server.serve_forever()
+    finally:
+        scheduler.cancel()
+        await server.close()
+        bank_system.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the bank over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data-file", default="bank_data.json")
+    parser.add_argument(
+        "--hash-workers",
+        type=int,
+        default=0,
+        help="hash passwords in a process pool of this size",
+    )
+    parser.add_argument(
+        "--fx-rates", help="JSON rates file enabling transfers between currencies"
+    )
+    parser.add_argument(
+        "--tick",
+        type=float,
+        default=60.0,
+        help="seconds between runs of due standing orders",
+    )
+    parser.add_argument(
+        "--velocity-rules", help="JSON file of limits on withdrawals and transfers"
+    )
+    args = parser.parse_args()
+
+    if args.velocity_rules:
+        velocity.configure(velocity.load_rules(args.velocity_rules))
+    if args.hash_workers:
+        passwords.start_pool(args.hash_workers)
+    try:
+        asyncio.run(
+            serve(args.host, args.port, args.data_file, args.fx_rates, args.tick)
+        )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        passwords.stop_pool()
+
+
+if __name__ == "__main__":
+    main()
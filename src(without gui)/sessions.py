@@ -0,0 +1,107 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+
+class Session:
+    __slots__ = ("user_id", "created", "last_seen")
+
+    def __init__(self, user_id: int, now: float):
+        self.user_id = user_id
+        self.created = now
+        self.last_seen = now
+
+
+class SessionManager:
+    """Opaque session tokens validated in O(1) from memory.
+
+    A session expires after idle_timeout seconds without use or
+    absolute_timeout seconds after it was issued, whichever comes first.
+    At most max_sessions are kept; issuing one more evicts the least
+    recently used.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = 15 * 60,
+        absolute_timeout: float = 8 * 60 * 60,
+        max_sessions: int = 10000,
+    ):
+        self.idle_timeout = idle_timeout
+        self.absolute_timeout = absolute_timeout
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        # Least recently used first
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+
+    def create(self, user_id: int) -> str:
+        """Issue a new token for an authenticated user"""
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            self._sessions[token] = Session(user_id, time.monotonic())
+            self._by_user.setdefault(user_id, set()).add(token)
+            while len(self._sessions) > self.max_sessions:
+                self._remove(next(iter(self._sessions)))
+        return token
+
+    def validate(self, token: Optional[str]) -> Optional[int]:
+        """Return the user_id of a live session and mark it as used"""
+        if token is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            if (
+                now - session.last_seen > self.idle_timeout
+                or now - session.created > self.absolute_timeout
+            ):
+                self._remove(token)
+                return None
+            session.last_seen = now
+            self._sessions.move_to_end(token)
+            return session.user_id
+
+    def invalidate(self, token: Optional[str]) -> bool:
+        """End one session; False if it did not exist"""
+        with self._lock:
+            if token not in self._sessions:
+                return False
+            self._remove(token)
+            return True
+
+    def invalidate_user(self, user_id: int) -> int:
+        """End every session of a user; return how many there were"""
+        with self._lock:
+            tokens = list(self._by_user.get(user_id, ()))
+            for token in tokens:
+                self._remove(token)
+            return len(tokens)
+
+    def purge_expired(self) -> int:
+        """Drop expired sessions; return how many were dropped"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                token
+                for token, session in self._sessions.items()
+                if now - session.last_seen > self.idle_timeout
+                or now - session.created > self.absolute_timeout
+            ]
+            for token in expired:
+                self._remove(token)
+            return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _remove(self, token: str) -> None:
+        session = self._sessions.pop(token)
+        tokens = self._by_user[session.user_id]
+        tokens.discard(token)
+        if not tokens:
+            del self._by_user[session.user_id]
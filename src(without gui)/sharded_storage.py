@@ -0,0 +1,170 @@
+import glob
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Union
+
+import snapshot
+from user import User
+from bank_account import BankAccount
+from instrumentation import timed
+from storage import Storage
+from transaction_store import TransactionStore
+
+
+def _to_raw(
+    account_number: str, account: Union[BankAccount, snapshot.RawAccount]
+) -> snapshot.RawAccount:
+    """Encode an account as a block that can be sent to another process"""
+    if isinstance(account, snapshot.RawAccount):
+        return account._replace(block=bytes(account.block))
+    return snapshot.RawAccount(
+        account_number,
+        account.user_id,
+        account.currency,
+        account.balance,
+        len(account.transactions),
+        account.transactions.to_bytes(),
+    )
+
+
+def _from_raw(raw: snapshot.RawAccount) -> BankAccount:
+    account = BankAccount(raw.account_number, raw.user_id, raw.currency)
+    account.balance = raw.balance
+    account.transactions = TransactionStore.from_bytes(raw.block)
+    return account
+
+
+def _load_shard(path: str) -> List[snapshot.RawAccount]:
+    """Parse one shard file in a worker; accounts come back as blocks"""
+    if snapshot.is_binary(path):
+        with open(path, "rb") as file:
+            buf = memoryview(file.read())
+        return [
+            _to_raw(entry[0], snapshot.RawAccount.from_entry(buf, entry))
+            for entry in snapshot.read_index(buf, snapshot.read_index_offset(buf))
+        ]
+    _, _, accounts = snapshot.read_json(path)
+    return [_to_raw(acc_num, account) for acc_num, account in accounts.items()]
+
+
+def _save_shard(path: str, snapshot_format: str, accounts: list) -> None:
+    """Write one shard file in a worker"""
+    if snapshot_format == "binary":
+        shard = {raw.account_number: raw for raw in accounts}
+    else:
+        shard = {raw.account_number: _from_raw(raw) for raw in accounts}
+    snapshot.save(path, {}, {}, shard, snapshot_format)
+
+
+class ShardedStorage(Storage):
+    """Snapshot split into shard files by account-number range.
+
+    The file at path is an ordinary snapshot holding meta and users plus the
+    list of shards; each shard is a snapshot holding one range of accounts.
+    Shards are parsed and written in parallel by a process pool. A save
+    writes a new generation of shard files and then replaces the manifest,
+    so a crash mid-save leaves the previous generation intact.
+
+    The pool is created on first use and kept until close(). Its workers
+    come from a forkserver (spawn where that is unavailable), never a fork
+    of this process, which may hold locks in other threads.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        shards: int = 8,
+        workers: Optional[int] = None,
+        snapshot_format: str = "binary",
+    ):
+        self.path = path
+        self.shards = shards
+        self.workers = workers or os.cpu_count() or 1
+        self.snapshot_format = snapshot_format
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                methods = multiprocessing.get_all_start_methods()
+                method = "forkserver" if "forkserver" in methods else "spawn"
+                self._pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context(method)
+                )
+            return self._pool
+
+    def close(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _shard_path(self, name: str) -> str:
+        return os.path.join(os.path.dirname(os.path.abspath(self.path)), name)
+
+    @timed("sharded.load")
+    def load(self) -> snapshot.Snapshot:
+        meta, users, accounts = snapshot.load(self.path)
+        shards = meta.pop("shards", None)
+        if shards is None:
+            # An unsharded snapshot; the next save will shard it
+            return meta, users, accounts
+
+        paths = [self._shard_path(shard["path"]) for shard in shards]
+        if self.workers <= 1:
+            for path in paths:
+                accounts.update(snapshot.load(path)[2])
+            return meta, users, accounts
+
+        # Accounts travel back as encoded blocks, which are cheap to decode
+        for shard in self._executor().map(_load_shard, paths):
+            for raw in shard:
+                accounts[raw.account_number] = _from_raw(raw)
+        return meta, users, accounts
+
+    @timed("sharded.save")
+    def save(self, meta: dict, users: Dict[int, User], accounts: dict) -> None:
+        numbers = sorted(accounts, key=lambda n: (len(n), n))
+        size = -(-len(numbers) // self.shards) or 1
+        ranges = [numbers[i : i + size] for i in range(0, len(numbers), size)]
+
+        generation = time.time_ns()
+        base = os.path.basename(self.path)
+        shards = [
+            {
+                "path": f"{base}.{generation}.shard{i}",
+                "first": chunk[0],
+                "last": chunk[-1],
+            }
+            for i, chunk in enumerate(ranges)
+        ]
+        paths = [self._shard_path(shard["path"]) for shard in shards]
+        if self.workers <= 1:
+            for path, chunk in zip(paths, ranges):
+                shard = {n: accounts[n] for n in chunk}
+                snapshot.save(path, {}, {}, shard, self.snapshot_format)
+        else:
+            list(
+                self._executor().map(
+                    _save_shard,
+                    paths,
+                    [self.snapshot_format] * len(ranges),
+                    [[_to_raw(n, accounts[n]) for n in chunk] for chunk in ranges],
+                )
+            )
+
+        manifest = dict(meta, shards=shards)
+        snapshot.save(self.path, manifest, users, {}, self.snapshot_format)
+
+        # The manifest now points at the new generation only
+        current = {self._shard_path(shard["path"]) for shard in shards}
+        for path in glob.glob(glob.escape(self.path) + ".*.shard*"):
+            if os.path.abspath(path) not in current:
+                os.remove(path)
@@ -0,0 +1,314 @@
+import argparse
+import json
+import os
+import struct
+from typing import Dict, List, NamedTuple, Tuple, Union
+
+from user import User
+from bank_account import BankAccount
+from transaction_store import TransactionStore
+
+# Binary layout: MAGIC, meta JSON, users, one block per account, account
+# index, and a trailing offset pointing at the index
+MAGIC = b"BNKSNAP2"
+_U32 = struct.Struct("<I")
+_U64 = struct.Struct("<Q")
+_USER = struct.Struct("<qI")  # user_id, login_attempts
+_INDEX_ENTRY = struct.Struct("<qdQII")  # user_id, balance, offset, length, count
+
+FORMATS = ("json", "binary")
+
+Snapshot = Tuple[dict, Dict[int, User], Dict[str, BankAccount]]
+IndexEntry = Tuple[str, int, str, float, int, int, int]
+
+
+class RawAccount(NamedTuple):
+    """An account block copied verbatim from an existing binary snapshot"""
+
+    account_number: str
+    user_id: int
+    currency: str
+    balance: float
+    count: int
+    block: memoryview
+
+    @classmethod
+    def from_entry(cls, buf, entry: IndexEntry) -> "RawAccount":
+        account_number, user_id, currency, balance, offset, length, count = entry
+        return cls(
+            account_number,
+            user_id,
+            currency,
+            balance,
+            count,
+            buf[offset : offset + length],
+        )
+
+
+def _sync(file) -> None:
+    """Flush a file being written all the way to disk"""
+    file.flush()
+    os.fsync(file.fileno())
+
+
+def _sync_directory(path: str) -> None:
+    """Make a rename inside path's directory durable (POSIX only)"""
+    if os.name != "posix":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _pack_str(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return _U32.pack(len(data)) + data
+
+
+def _unpack_str(buf, offset: int) -> Tuple[str, int]:
+    (size,) = _U32.unpack_from(buf, offset)
+    offset += _U32.size
+    return str(buf[offset : offset + size], "utf-8"), offset + size
+
+
+def _encode_user(user: User) -> bytes:
+    locked_until = user.locked_until.isoformat() if user.locked_until else ""
+    return b"".join(
+        [
+            _USER.pack(user.user_id, user.login_attempts),
+            _pack_str(user.full_name),
+            _pack_str(user.phone),
+            _pack_str(user.password),
+            _pack_str(locked_until),
+            _pack_str(",".join(user.accounts)),
+        ]
+    )
+
+
+def _decode_user(buf, offset: int) -> Tuple[User, int]:
+    user_id, login_attempts = _USER.unpack_from(buf, offset)
+    offset += _USER.size
+    full_name, offset = _unpack_str(buf, offset)
+    phone, offset = _unpack_str(buf, offset)
+    password, offset = _unpack_str(buf, offset)
+    locked_until, offset = _unpack_str(buf, offset)
+    accounts, offset = _unpack_str(buf, offset)
+    user = User.from_dict(
+        {
+            "user_id": user_id,
+            "full_name": full_name,
+            "phone": phone,
+            "password": password,
+            "accounts": accounts.split(",") if accounts else [],
+            "login_attempts": login_attempts,
+            "locked_until": locked_until or None,
+        }
+    )
+    return user, offset
+
+
+def encode_account(account: BankAccount) -> bytes:
+    """Encode an account's transaction columns"""
+    return account.transactions.to_bytes()
+
+
+def decode_account(buf, entry: IndexEntry) -> BankAccount:
+    """Rebuild one account from its block without going through dicts"""
+    account_number, user_id, currency, balance, offset, length, _ = entry
+    account = BankAccount(account_number, user_id, currency)
+    account.balance = balance
+    account.transactions = TransactionStore.from_bytes(buf[offset : offset + length])
+    return account
+
+
+def read_header(buf) -> Tuple[dict, Dict[int, User], int]:
+    """Decode meta and users; return them with the account index offset"""
+    if bytes(buf[: len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a binary bank snapshot")
+
+    offset = len(MAGIC)
+    (meta_len,) = _U32.unpack_from(buf, offset)
+    offset += _U32.size
+    meta = json.loads(str(buf[offset : offset + meta_len], "utf-8"))
+    offset += meta_len
+
+    (user_count,) = _U32.unpack_from(buf, offset)
+    offset += _U32.size
+    users = {}
+    for _ in range(user_count):
+        user, offset = _decode_user(buf, offset)
+        users[user.user_id] = user
+
+    return meta, users, read_index_offset(buf)
+
+
+def read_index_offset(buf) -> int:
+    """Return where the account index starts, from the trailer"""
+    if bytes(buf[: len(MAGIC)]) != MAGIC:
+        raise ValueError("Not a binary bank snapshot")
+    (index_offset,) = _U64.unpack_from(buf, len(buf) - _U64.size)
+    return index_offset
+
+
+def read_index(buf, offset: int) -> List[IndexEntry]:
+    """Decode the account index that follows the account blocks"""
+    (count,) = _U32.unpack_from(buf, offset)
+    offset += _U32.size
+    entries = []
+    for _ in range(count):
+        account_number, offset = _unpack_str(buf, offset)
+        currency, offset = _unpack_str(buf, offset)
+        user_id, balance, block_offset, length, txn_count = _INDEX_ENTRY.unpack_from(
+            buf, offset
+        )
+        offset += _INDEX_ENTRY.size
+        entries.append(
+            (
+                account_number,
+                user_id,
+                currency,
+                balance,
+                block_offset,
+                length,
+                txn_count,
+            )
+        )
+    return entries
+
+
+def read_binary(path: str) -> Snapshot:
+    """Load a binary snapshot"""
+    with open(path, "rb") as file:
+        buf = memoryview(file.read())
+
+    meta, users, index_offset = read_header(buf)
+    accounts = {}
+    for entry in read_index(buf, index_offset):
+        accounts[entry[0]] = decode_account(buf, entry)
+    return meta, users, accounts
+
+
+def write_binary(
+    path: str,
+    meta: dict,
+    users: Dict[int, User],
+    accounts: Dict[str, Union[BankAccount, RawAccount]],
+) -> None:
+    """Write a binary snapshot; RawAccount blocks are copied as they are"""
+    with open(path, "wb") as file:
+        meta_bytes = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+        file.write(MAGIC + _U32.pack(len(meta_bytes)) + meta_bytes)
+        file.write(_U32.pack(len(users)))
+        file.write(b"".join(_encode_user(user) for user in users.values()))
+
+        index = [_U32.pack(len(accounts))]
+        for account_number, account in accounts.items():
+            if isinstance(account, RawAccount):
+                block, count = account.block, account.count
+            else:
+                block, count = encode_account(account), len(account.transactions)
+            index.append(_pack_str(account_number))
+            index.append(_pack_str(account.currency))
+            index.append(
+                _INDEX_ENTRY.pack(
+                    account.user_id,
+                    account.balance,
+                    file.tell(),
+                    len(block),
+                    count,
+                )
+            )
+            file.write(block)
+
+        index_offset = file.tell()
+        file.write(b"".join(index))
+        file.write(_U64.pack(index_offset))
+        _sync(file)
+
+
+def read_json(path: str) -> Snapshot:
+    """Load a JSON snapshot"""
+    with open(path, "r") as file:
+        data = json.load(file)
+
+    users = {int(uid): User.from_dict(u) for uid, u in data.pop("users").items()}
+    accounts = {
+        acc_num: BankAccount.from_dict(acc_data)
+        for acc_num, acc_data in data.pop("accounts").items()
+    }
+    return data, users, accounts
+
+
+def write_json(
+    path: str, meta: dict, users: Dict[int, User], accounts: Dict[str, BankAccount]
+) -> None:
+    """Write a pretty-printed JSON snapshot"""
+    data = dict(meta)
+    data["users"] = {str(uid): user.to_dict() for uid, user in users.items()}
+    data["accounts"] = {
+        acc_num: account.to_dict() for acc_num, account in accounts.items()
+    }
+
+    with open(path, "w") as file:
+        json.dump(data, file, indent=2)
+        _sync(file)
+
+
+def is_binary(path: str) -> bool:
+    """Check whether a data file holds a binary snapshot"""
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def load(path: str) -> Snapshot:
+    """Load a snapshot in whichever format the file is in"""
+    if is_binary(path):
+        return read_binary(path)
+    return read_json(path)
+
+
+def save(
+    path: str,
+    meta: dict,
+    users: Dict[int, User],
+    accounts: Dict[str, BankAccount],
+    snapshot_format: str = "json",
+) -> None:
+    """Write a snapshot next to the target and move it into place.
+
+    The temporary file is synced before the rename and the directory after
+    it, so a crash leaves either the old or the new snapshot, never a mix.
+    """
+    if snapshot_format not in FORMATS:
+        raise ValueError(f"Unknown snapshot format: {snapshot_format}")
+
+    temp_path = path + ".tmp"
+    if snapshot_format == "binary":
+        write_binary(temp_path, meta, users, accounts)
+    else:
+        write_json(temp_path, meta, users, accounts)
+    os.replace(temp_path, path)
+    _sync_directory(path)
+
+
+def convert(src: str, dst: str, snapshot_format: str) -> None:
+    """Convert a snapshot file between the JSON and binary formats"""
+    meta, users, accounts = load(src)
+    save(dst, meta, users, accounts, snapshot_format)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert bank snapshot files")
+    parser.add_argument("src", help="existing JSON or binary snapshot")
+    parser.add_argument("dst", help="file to write")
+    parser.add_argument("--format", choices=FORMATS, default="binary")
+    args = parser.parse_args()
+
+    convert(args.src, args.dst, args.format)
+    print(f"Wrote {args.format} snapshot to {args.dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+import argparse
+import datetime
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import snapshot
+from user import User
+from bank_account import BankAccount
+from instrumentation import timed
+from storage import Storage
+from transaction import Transaction
+from transaction_store import EPOCH, MICROSECOND, TransactionStore, to_micros
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    full_name TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    password TEXT NOT NULL,
+    login_attempts INTEGER NOT NULL DEFAULT 0,
+    locked_until TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_phone ON users (phone);
+CREATE TABLE IF NOT EXISTS accounts (
+    account_number TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users (user_id),
+    currency TEXT NOT NULL,
+    balance REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS accounts_user ON accounts (user_id);
+CREATE TABLE IF NOT EXISTS transactions (
+    row_id INTEGER PRIMARY KEY,
+    account_number TEXT NOT NULL REFERENCES accounts (account_number),
+    transaction_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    amount REAL NOT NULL,
+    from_account TEXT,
+    to_account TEXT,
+    stamp INTEGER NOT NULL  -- microseconds since 1970-01-01
+);
+CREATE INDEX IF NOT EXISTS transactions_account_time
+    ON transactions (account_number, stamp);
+CREATE TABLE IF NOT EXISTS idempotency (
+    key TEXT PRIMARY KEY,
+    result INTEGER NOT NULL,
+    expires REAL NOT NULL  -- seconds since 1970-01-01
+);
+CREATE INDEX IF NOT EXISTS idempotency_expires ON idempotency (expires);
+CREATE TABLE IF NOT EXISTS standing_orders (
+    order_id INTEGER PRIMARY KEY,
+    from_account TEXT NOT NULL,
+    to_account TEXT NOT NULL,
+    amount REAL NOT NULL,
+    next_run TEXT NOT NULL,
+    interval REAL,  -- seconds; NULL for a one-off transfer
+    until TEXT
+);
+"""
+
+# Statements are kept as constants so sqlite3's statement cache reuses them
+_SET_META = "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)"
+_RAISE_META = (
+    "INSERT INTO meta (key, value) VALUES (?, ?) "
+    "ON CONFLICT (key) DO UPDATE SET value = max(value, excluded.value)"
+)
+_INSERT_USER = (
+    "INSERT OR REPLACE INTO users (user_id, full_name, phone, password, "
+    "login_attempts, locked_until) VALUES (?, ?, ?, ?, ?, ?)"
+)
+_INSERT_ACCOUNT = (
+    "INSERT OR REPLACE INTO accounts (account_number, user_id, currency, balance) "
+    "VALUES (?, ?, ?, ?)"
+)
+_UPDATE_BALANCE = "UPDATE accounts SET balance = ? WHERE account_number = ?"
+_INSERT_TRANSACTION = (
+    "INSERT INTO transactions (account_number, transaction_id, type, amount, "
+    "from_account, to_account, stamp) VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+_SELECT_STATEMENT = (
+    "SELECT transaction_id, type, amount, from_account, to_account, stamp "
+    "FROM transactions WHERE account_number = ? AND stamp >= ? AND stamp < ? "
+    "ORDER BY stamp {order}, row_id {order} LIMIT ?"
+)
+_INSERT_KEY = (
+    "INSERT OR REPLACE INTO idempotency (key, result, expires) VALUES (?, ?, ?)"
+)
+_EXPIRE_KEYS = "DELETE FROM idempotency WHERE expires <= ?"
+_INSERT_ORDER = (
+    "INSERT OR REPLACE INTO standing_orders (order_id, from_account, to_account, "
+    "amount, next_run, interval, until) VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+_ADVANCE_ORDER = "UPDATE standing_orders SET next_run = ? WHERE order_id = ?"
+_DELETE_ORDER = "DELETE FROM standing_orders WHERE order_id = ?"
+_ORDER_FIELDS = (
+    "order_id",
+    "from_account",
+    "to_account",
+    "amount",
+    "next_run",
+    "interval",
+    "until",
+)
+_MAX_STAMP = 2**63 - 1
+# Counters only get a meta row once apply() first raises them
+_DEFAULT_META = {"next_user_id": 1, "next_account_number": 10000, "next_order_id": 1}
+
+
+def _user_row(user: dict) -> tuple:
+    """Row for a user in its to_dict() form"""
+    return (
+        user["user_id"],
+        user["full_name"],
+        user["phone"],
+        user["password"],
+        user["login_attempts"],
+        user["locked_until"],
+    )
+
+
+def _transaction_row(account_number: str, t: dict) -> tuple:
+    return (
+        account_number,
+        t["transaction_id"],
+        t["type"],
+        t["amount"],
+        t["from_account"],
+        t.get("to_account"),
+        to_micros(datetime.datetime.fromisoformat(t["timestamp"])),
+    )
+
+
+class SQLiteStorage(Storage):
+    """Bank state in a SQLite database.
+
+    Each mutation record is committed as one small transaction, and the
+    database runs in WAL mode so readers never block the writer.
+    """
+
+    incremental = True
+
+    def __init__(self, path: str, synchronous: str = "FULL"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute(f"PRAGMA synchronous = {synchronous}")
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.executescript(SCHEMA)
+
+    def exists(self) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT count(*) FROM meta").fetchone()
+        return row[0] > 0
+
+    @timed("sqlite.load")
+    def load(self) -> snapshot.Snapshot:
+        with self._lock:
+            conn = self._conn
+            meta = dict(_DEFAULT_META)
+            meta.update(conn.execute("SELECT key, value FROM meta"))
+            meta["idempotency"] = [
+                [key, bool(result), expires]
+                for key, result, expires in conn.execute(
+                    "SELECT key, result, expires FROM idempotency ORDER BY rowid"
+                )
+            ]
+            meta["scheduled"] = [
+                dict(zip(_ORDER_FIELDS, row))
+                for row in conn.execute(
+                    f"SELECT {', '.join(_ORDER_FIELDS)} FROM standing_orders"
+                )
+            ]
+
+            accounts: Dict[str, BankAccount] = {}
+            owned: Dict[int, List[str]] = {}
+            for account_number, user_id, currency, balance in conn.execute(
+                "SELECT account_number, user_id, currency, balance "
+                "FROM accounts ORDER BY rowid"
+            ):
+                account = BankAccount(account_number, user_id, currency)
+                account.balance = balance
+                accounts[account_number] = account
+                owned.setdefault(user_id, []).append(account_number)
+
+            users = {}
+            for row in conn.execute("SELECT * FROM users ORDER BY user_id"):
+                user_id, full_name, phone, password, attempts, locked_until = row
+                users[user_id] = User.from_dict(
+                    {
+                        "user_id": user_id,
+                        "full_name": full_name,
+                        "phone": phone,
+                        "password": password,
+                        "accounts": owned.get(user_id, []),
+                        "login_attempts": attempts,
+                        "locked_until": locked_until,
+                    }
+                )
+
+            store = None
+            current = None
+            for account_number, tid, kind, amount, src, dst, stamp in conn.execute(
+                "SELECT account_number, transaction_id, type, amount, "
+                "from_account, to_account, stamp FROM transactions "
+                "ORDER BY account_number, row_id"
+            ):
+                if account_number != current:
+                    current = account_number
+                    store = TransactionStore()
+                    accounts[account_number].transactions = store
+                store._append_row(
+                    tid, kind, amount, src, dst, EPOCH + MICROSECOND * stamp
+                )
+        return meta, users, accounts
+
+    @timed("sqlite.save")
+    def save(self, meta: dict, users: Dict[int, User], accounts: dict) -> None:
+        with self._lock, self._conn as conn:
+            for table in (
+                "transactions",
+                "accounts",
+                "users",
+                "meta",
+                "idempotency",
+                "standing_orders",
+            ):
+                conn.execute(f"DELETE FROM {table}")
+            meta = dict(meta)
+            conn.executemany(_INSERT_KEY, meta.pop("idempotency", []))
+            conn.executemany(
+                _INSERT_ORDER,
+                (
+                    [order[field] for field in _ORDER_FIELDS]
+                    for order in meta.pop("scheduled", [])
+                ),
+            )
+            conn.executemany(_SET_META, meta.items())
+            conn.executemany(
+                _INSERT_USER, (_user_row(user.to_dict()) for user in users.values())
+            )
+            conn.executemany(
+                _INSERT_ACCOUNT,
+                (
+                    (acc_num, a.user_id, a.currency, a.balance)
+                    for acc_num, a in accounts.items()
+                ),
+            )
+            for account_number, account in accounts.items():
+                store = account.transactions
+                conn.executemany(
+                    _INSERT_TRANSACTION,
+                    (
+                        (
+                            account_number,
+                            t.transaction_id,
+                            t.type,
+                            t.amount,
+                            t.from_account,
+                            t.to_account,
+                            store._stamps[row],
+                        )
+                        for row, t in enumerate(store)
+                    ),
+                )
+
+    @timed("sqlite.apply")
+    def apply(self, record: dict) -> None:
+        op = record["op"]
+        with self._lock, self._conn as conn:
+            if op == "user":
+                user = record["user"]
+                conn.execute(_INSERT_USER, _user_row(user))
+                conn.execute(_RAISE_META, ("next_user_id", user["user_id"] + 1))
+            elif op == "account":
+                account = record["account"]
+                conn.execute(
+                    _INSERT_ACCOUNT,
+                    (
+                        account["account_number"],
+                        account["user_id"],
+                        account["currency"],
+                        account["balance"],
+                    ),
+                )
+                conn.execute(
+                    _RAISE_META,
+                    ("next_account_number", int(account["account_number"]) + 1),
+                )
+            elif op == "txn":
+                legs = record["legs"]
+                conn.executemany(
+                    _UPDATE_BALANCE, ((balance, acc) for acc, balance, _ in legs)
+                )
+                conn.executemany(
+                    _INSERT_TRANSACTION,
+                    (_transaction_row(acc, t) for acc, _, t in legs),
+                )
+                if "key" in record:
+                    key, expires = record["key"]
+                    conn.execute(_EXPIRE_KEYS, (time.time(),))
+                    conn.execute(_INSERT_KEY, (key, True, expires))
+                for order_id, next_run in record.get("orders", ()):
+                    if next_run is None:
+                        conn.execute(_DELETE_ORDER, (order_id,))
+                    else:
+                        conn.execute(_ADVANCE_ORDER, (next_run, order_id))
+            elif op == "schedule":
+                order = record["order"]
+                conn.execute(_INSERT_ORDER, [order[field] for field in _ORDER_FIELDS])
+                conn.execute(_RAISE_META, ("next_order_id", order["order_id"] + 1))
+            elif op == "unschedule":
+                conn.execute(_DELETE_ORDER, (record["order_id"],))
+
+    def statement(
+        self,
+        account_number: str,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = True,
+    ) -> List[Transaction]:
+        """Query an account's transactions with start <= t < end.
+
+        This is an index range scan, so reporting tools can read statements
+        straight from the database without loading the bank.
+        """
+        sql = _SELECT_STATEMENT.format(order="DESC" if newest_first else "ASC")
+        params = (
+            account_number,
+            to_micros(start) if start else 0,
+            to_micros(end) if end else _MAX_STAMP,
+            -1 if limit is None else limit,
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        return [
+            Transaction.restore(
+                tid, kind, amount, src, dst, EPOCH + MICROSECOND * stamp
+            )
+            for tid, kind, amount, src, dst, stamp in rows
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def migrate(src: str, dst: str) -> None:
+    """Copy a JSON or binary data file, and its journal tail, into SQLite"""
+    from bank_system import BankSystem
+
+    journal = os.path.exists(src + ".journal")
+    bank = BankSystem(src, journal=journal)
+    storage = SQLiteStorage(dst)
+    bank.export(storage)
+    storage.close()
+    if bank.journal is not None:
+        bank.journal.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate bank data to SQLite")
+    parser.add_argument("src", help="existing JSON or binary data file")
+    parser.add_argument("dst", help="SQLite database to write")
+    args = parser.parse_args()
+
+    migrate(args.src, args.dst)
+    print(f"Migrated {args.src} to {args.dst}")
+
+
+if __name__ == "__main__":
+    main()
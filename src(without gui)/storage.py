@@ -0,0 +1,55 @@
+import os
+from typing import Dict
+
+import snapshot
+from user import User
+from bank_account import BankAccount
+
+
+class Storage:
+    """Where a BankSystem keeps its state between runs.
+
+    A backend must at least load and save the full state. Backends that set
+    incremental also persist single mutation records through apply(), so a
+    BankSystem using them needs neither a journal nor full rewrites.
+    """
+
+    incremental = False
+
+    def exists(self) -> bool:
+        """Check whether there is saved state to load"""
+        raise NotImplementedError
+
+    def load(self) -> snapshot.Snapshot:
+        """Return (meta, users, accounts)"""
+        raise NotImplementedError
+
+    def save(
+        self, meta: dict, users: Dict[int, User], accounts: Dict[str, BankAccount]
+    ) -> None:
+        """Replace the saved state with the given one"""
+        raise NotImplementedError
+
+    def apply(self, record: dict) -> None:
+        """Persist one mutation record ("user", "account" or "txn")"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class FileStorage(Storage):
+    """A JSON or binary snapshot file, rewritten on every save"""
+
+    def __init__(self, path: str, snapshot_format: str = "json"):
+        self.path = path
+        self.snapshot_format = snapshot_format
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> snapshot.Snapshot:
+        return snapshot.load(self.path)
+
+    def save(self, meta: dict, users: Dict[int, User], accounts: dict) -> None:
+        snapshot.save(self.path, meta, users, accounts, self.snapshot_format)
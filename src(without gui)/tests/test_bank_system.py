@@ -0,0 +1,29 @@
+import os
+import tempfile
+import unittest
+
+from bank_system import BankSystem
+
+
+class CaptureTest(unittest.TestCase):
+    def test_account_created_after_capture_is_not_in_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            bank = BankSystem(
+                os.path.join(directory, "bank_data.json"), write_behind=True
+            )
+            user = bank.register_user("Test User", "555-0100", "secret")
+            bank.create_account(user)
+
+            meta, users, accounts = bank._capture()
+            bank.create_account(user)
+
+            self.assertIsNot(users[user.user_id].accounts, user.accounts)
+            self.assertEqual(len(users[user.user_id].accounts), 1)
+            self.assertEqual(len(user.accounts), 2)
+            for account_number in users[user.user_id].accounts:
+                self.assertIn(account_number, accounts)
+            bank.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,58 @@
-import uuid
 import datetime
+import os
+import threading
+import time
 from typing import Optional
 
+_LOW_62 = (1 << 62) - 1
+_VARIANT = 0b10 << 62
+_id_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+_prefix = ""  # first three groups, fixed for a millisecond
+
+
+def _reset_id_state() -> None:
+    global _last_ms
+    _last_ms = 0
+
+
+if hasattr(os, "register_at_fork"):
+    # A forked child must not continue the parent's sequence
+    os.register_at_fork(after_in_child=_reset_id_state)
+
+
+def new_transaction_id() -> str:
+    """Return a UUIDv7-style id that sorts in creation order.
+
+    48 bits of Unix milliseconds are followed by a 74-bit counter that
+    starts at a random value each millisecond and counts up within it, so
+    ids stay unique across processes and monotonic within one.
+    """
+    global _last_ms, _counter, _prefix
+    with _id_lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            # 71 random bits leave room to count up within the millisecond
+            _counter = int.from_bytes(os.urandom(9), "big") >> 1
+            stale = True
+        else:
+            # Same millisecond, or the clock stepped back: keep counting
+            _counter += 1
+            if _counter >> 74:
+                _last_ms += 1
+                _counter = 0
+            # The prefix holds the counter's top 12 bits; a carry changes it
+            stale = not _counter & _LOW_62
+        if stale:
+            h = f"{(_last_ms << 16) | (0x7 << 12) | (_counter >> 62):016x}"
+            _prefix = f"{h[:8]}-{h[8:12]}-{h[12:]}-"
+        prefix, counter = _prefix, _counter
+
+    low = f"{_VARIANT | (counter & _LOW_62):016x}"
+    return f"{prefix}{low[:4]}-{low[4:]}"
+
 
 class Transaction:
     def __init__(
@@ -11,7 +62,7 @@ class Transaction:
         from_account: str,
         to_account: Optional[str] = None,
     ):
-        self.transaction_id = str(uuid.uuid4())
+        self.transaction_id = new_transaction_id()
         self.type = transaction_type  # 'deposit', 'withdraw', 'transfer'
         self.amount = amount
         self.from_account = from_account
@@ -32,14 +83,33 @@ class Transaction:
     @classmethod
     def from_dict(cls, data: dict) -> "Transaction":
         """Create Transaction object from dictionary"""
-        transaction = cls(
-            transaction_type=data["type"],
-            amount=data["amount"],
-            from_account=data["from_account"],
-            to_account=data.get("to_account"),
+        return cls.restore(
+            data["transaction_id"],
+            data["type"],
+            data["amount"],
+            data["from_account"],
+            data.get("to_account"),
+            datetime.datetime.fromisoformat(data["timestamp"]),
         )
-        transaction.transaction_id = data["transaction_id"]
-        transaction.timestamp = datetime.datetime.fromisoformat(data["timestamp"])
+
+    @classmethod
+    def restore(
+        cls,
+        transaction_id: str,
+        transaction_type: str,
+        amount: float,
+        from_account: str,
+        to_account: Optional[str],
+        timestamp: datetime.datetime,
+    ) -> "Transaction":
+        """Rebuild a stored transaction without generating an id or timestamp"""
+        transaction = cls.__new__(cls)
+        transaction.transaction_id = transaction_id
+        transaction.type = transaction_type
+        transaction.amount = amount
+        transaction.from_account = from_account
+        transaction.to_account = to_account
+        transaction.timestamp = timestamp
         return transaction
 
     def __str__(self) -> str:
@@ -0,0 +1,377 @@
+import datetime
+import json
+import operator
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from transaction import Transaction
+
+EPOCH = datetime.datetime(1970, 1, 1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+TYPE_CODES = {"deposit": 0, "withdraw": 1, "transfer": 2}
+TYPE_NAMES = ("deposit", "withdraw", "transfer")
+# Running balance checkpoints are kept every this many transactions
+CHECKPOINT_INTERVAL = 128
+
+# Account numbers are interned once per process and referenced by a small
+# integer from the from/to columns; ref 0 stands for "no account"
+_account_refs: List[Optional[str]] = [None]
+_account_index: Dict[Optional[str], int] = {None: 0}
+_intern_lock = threading.Lock()
+
+_BLOCK_HEADER = struct.Struct("<III")  # count, strings length, odd ids length
+
+
+def account_ref(account_number: Optional[str]) -> int:
+    """Return the interned reference for an account number"""
+    ref = _account_index.get(account_number)
+    if ref is None:
+        with _intern_lock:
+            ref = _account_index.get(account_number)
+            if ref is None:
+                ref = len(_account_refs)
+                _account_refs.append(account_number)
+                _account_index[account_number] = ref
+    return ref
+
+
+def _uuid_bytes(transaction_id: str) -> Optional[bytes]:
+    """Pack a canonical UUID string into 16 bytes, or None if it is not one"""
+    if (
+        len(transaction_id) == 36
+        and transaction_id[8] == transaction_id[13] == "-"
+        and transaction_id[18] == transaction_id[23] == "-"
+        and transaction_id == transaction_id.lower()
+    ):
+        try:
+            packed = bytes.fromhex(transaction_id.replace("-", ""))
+        except ValueError:
+            return None
+        if len(packed) == 16:
+            return packed
+    return None
+
+
+def to_micros(timestamp: datetime.datetime) -> int:
+    """Convert a naive datetime to the stored microsecond timestamp"""
+    return (timestamp - EPOCH) // MICROSECOND
+
+
+def _little_endian(column: array) -> array:
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+class TransactionView:
+    """Read-only transaction backed by one row of a TransactionStore"""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: "TransactionStore", row: int):
+        self._store = store
+        self._row = row
+
+    @property
+    def transaction_id(self) -> str:
+        return self._store._transaction_id(self._row)
+
+    @property
+    def type(self) -> str:
+        return TYPE_NAMES[self._store._types[self._row]]
+
+    @property
+    def amount(self) -> float:
+        return self._store._amounts[self._row]
+
+    @property
+    def from_account(self) -> Optional[str]:
+        return _account_refs[self._store._from[self._row]]
+
+    @property
+    def to_account(self) -> Optional[str]:
+        return _account_refs[self._store._to[self._row]]
+
+    @property
+    def timestamp(self) -> datetime.datetime:
+        return EPOCH + MICROSECOND * self._store._stamps[self._row]
+
+    to_dict = Transaction.to_dict
+    __str__ = Transaction.__str__
+
+
+class TransactionStore:
+    """Append-only, column-oriented transaction history of one account"""
+
+    def __init__(self):
+        self._ids = bytearray()  # 16-byte UUIDs
+        self._types = bytearray()
+        self._amounts = array("d")
+        self._stamps = array("q")  # microseconds since EPOCH
+        self._from = array("i")
+        self._to = array("i")
+        # Ids that are not UUIDs, keyed by row
+        self._odd_ids: Dict[int, str] = {}
+        # Rows are normally appended in time order, so _stamps doubles as
+        # the time index; None means not yet checked. Otherwise _order maps
+        # time-ordered positions to rows
+        self._sorted: Optional[bool] = True
+        self._order: Optional[array] = None
+        self._order_stamps: Optional[array] = None
+        # _checkpoints[k] is the owner's net balance change over the first
+        # k * CHECKPOINT_INTERVAL transactions in time order; it is extended
+        # on demand and rebuilt if the owner or the time order changes
+        self._checkpoints: Optional[array] = None
+        self._checkpoint_owner = 0
+        self._checkpoint_order: Optional[array] = None
+
+    def append(self, transaction) -> None:
+        """Store a Transaction (or any object with the same attributes)"""
+        self._append_row(
+            transaction.transaction_id,
+            transaction.type,
+            transaction.amount,
+            transaction.from_account,
+            transaction.to_account,
+            transaction.timestamp,
+        )
+
+    def _append_row(
+        self,
+        transaction_id: str,
+        transaction_type: str,
+        amount: float,
+        from_account: Optional[str],
+        to_account: Optional[str],
+        timestamp: datetime.datetime,
+    ) -> None:
+        packed = _uuid_bytes(transaction_id)
+        if packed is None:
+            self._odd_ids[len(self._types)] = transaction_id
+            packed = bytes(16)
+        stamp = to_micros(timestamp)
+        if self._stamps and stamp < self._stamps[-1]:
+            self._sorted = False
+        if self._order is not None:
+            if self._order_stamps and stamp < self._order_stamps[-1]:
+                self._order = self._order_stamps = None
+            else:
+                self._order.append(len(self._types))
+                self._order_stamps.append(stamp)
+
+        self._ids += packed
+        self._types.append(TYPE_CODES[transaction_type])
+        self._amounts.append(amount)
+        self._stamps.append(stamp)
+        self._from.append(account_ref(from_account))
+        self._to.append(account_ref(to_account))
+
+    def extend(self, transactions) -> None:
+        for transaction in transactions:
+            self.append(transaction)
+
+    def _transaction_id(self, row: int) -> str:
+        odd = self._odd_ids.get(row)
+        if odd is not None:
+            return odd
+        h = self._ids[16 * row : 16 * row + 16].hex()
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [TransactionView(self, row) for row in range(len(self))[index]]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("transaction index out of range")
+        return TransactionView(self, index)
+
+    def __iter__(self) -> Iterator[TransactionView]:
+        for row in range(len(self)):
+            yield TransactionView(self, row)
+
+    def _time_index(self) -> Tuple[array, Optional[array]]:
+        """Return stamps in time order and the row at each position"""
+        if self._sorted is None:
+            stamps = self._stamps
+            self._sorted = all(map(operator.le, stamps, islice(stamps, 1, None)))
+        if self._sorted:
+            return self._stamps, None
+
+        if self._order is None:
+            stamps = self._stamps
+            order = sorted(range(len(stamps)), key=stamps.__getitem__)
+            self._order = array("i", order)
+            self._order_stamps = array("q", [stamps[row] for row in order])
+        return self._order_stamps, self._order
+
+    def time_range(
+        self,
+        start: Optional[datetime.datetime] = None,
+        end: Optional[datetime.datetime] = None,
+    ) -> Tuple[int, int]:
+        """Return the [lo, hi) positions, in time order, of start <= t < end"""
+        stamps, _ = self._time_index()
+        lo = bisect_left(stamps, to_micros(start)) if start else 0
+        hi = bisect_left(stamps, to_micros(end)) if end else len(stamps)
+        return lo, max(lo, hi)
+
+    def in_time_order(
+        self, lo: int = 0, hi: Optional[int] = None, reverse: bool = False
+    ) -> Iterator[TransactionView]:
+        """Yield transactions at time-ordered positions lo..hi-1"""
+        _, order = self._time_index()
+        if hi is None:
+            hi = len(self)
+        positions = range(hi - 1, lo - 1, -1) if reverse else range(lo, hi)
+        for position in positions:
+            yield TransactionView(self, position if order is None else order[position])
+
+    def _delta(self, row: int, owner: int) -> float:
+        """Effect of one row on the balance of the account with ref owner"""
+        code = self._types[row]
+        if code == 0 or (code == 2 and self._from[row] != owner):
+            return self._amounts[row]
+        return -self._amounts[row]
+
+    def net_change_before(self, position: int, account_number: str) -> float:
+        """Net effect on account_number's balance of the transactions at
+        time-ordered positions 0..position-1.
+
+        A checkpoint lookup plus a replay of fewer than CHECKPOINT_INTERVAL
+        rows.
+        """
+        owner = account_ref(account_number)
+        _, order = self._time_index()
+        sums = self._checkpoints
+        if (
+            sums is None
+            or self._checkpoint_owner != owner
+            or self._checkpoint_order is not order
+        ):
+            sums = self._checkpoints = array("d", [0.0])
+            self._checkpoint_owner = owner
+            self._checkpoint_order = order
+
+        def row(p: int) -> int:
+            return p if order is None else order[p]
+
+        block = position // CHECKPOINT_INTERVAL
+        while len(sums) <= block:
+            start = (len(sums) - 1) * CHECKPOINT_INTERVAL
+            total = sums[-1]
+            for p in range(start, start + CHECKPOINT_INTERVAL):
+                total += self._delta(row(p), owner)
+            sums.append(total)
+
+        total = sums[block]
+        for p in range(block * CHECKPOINT_INTERVAL, position):
+            total += self._delta(row(p), owner)
+        return total
+
+    def copy(self) -> "TransactionStore":
+        """Return an independent copy of all columns"""
+        store = TransactionStore()
+        store._ids = bytearray(self._ids)
+        store._types = bytearray(self._types)
+        store._amounts = array("d", self._amounts)
+        store._stamps = array("q", self._stamps)
+        store._from = array("i", self._from)
+        store._to = array("i", self._to)
+        store._odd_ids = dict(self._odd_ids)
+        store._sorted = self._sorted
+        return store
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns"""
+        return (
+            len(self._ids)
+            + len(self._types)
+            + sum(
+                len(column) * column.itemsize
+                for column in (self._amounts, self._stamps, self._from, self._to)
+            )
+        )
+
+    def to_dicts(self) -> List[dict]:
+        return [view.to_dict() for view in self]
+
+    @classmethod
+    def from_dicts(cls, data: List[dict]) -> "TransactionStore":
+        store = cls()
+        parse = datetime.datetime.fromisoformat
+        for t in data:
+            store._append_row(
+                t["transaction_id"],
+                t["type"],
+                t["amount"],
+                t["from_account"],
+                t.get("to_account"),
+                parse(t["timestamp"]),
+            )
+        return store
+
+    def to_bytes(self) -> bytes:
+        """Encode the columns as a self-contained little-endian block"""
+        refs = sorted(set(self._from) | set(self._to))
+        local = {ref: i for i, ref in enumerate(refs)}
+        strings = "\0".join(_account_refs[ref] or "" for ref in refs).encode()
+        odd_ids = json.dumps(self._odd_ids).encode() if self._odd_ids else b""
+
+        return b"".join(
+            [
+                _BLOCK_HEADER.pack(len(self), len(strings), len(odd_ids)),
+                self._ids,
+                _little_endian(array("d", self._amounts)).tobytes(),
+                _little_endian(array("q", self._stamps)).tobytes(),
+                self._types,
+                _little_endian(
+                    array("i", map(local.__getitem__, self._from))
+                ).tobytes(),
+                _little_endian(array("i", map(local.__getitem__, self._to))).tobytes(),
+                strings,
+                odd_ids,
+            ]
+        )
+
+    @classmethod
+    def from_bytes(cls, buf) -> "TransactionStore":
+        """Decode a block written by to_bytes"""
+        count, strings_len, odd_len = _BLOCK_HEADER.unpack_from(buf, 0)
+        offset = _BLOCK_HEADER.size
+        store = cls()
+
+        def take(size: int):
+            nonlocal offset
+            chunk = buf[offset : offset + size]
+            offset += size
+            return chunk
+
+        store._ids = bytearray(take(16 * count))
+        store._amounts.frombytes(take(8 * count))
+        store._stamps.frombytes(take(8 * count))
+        store._types = bytearray(take(count))
+        local_from = array("i")
+        local_from.frombytes(take(4 * count))
+        local_to = array("i")
+        local_to.frombytes(take(4 * count))
+        for column in (store._amounts, store._stamps, local_from, local_to):
+            _little_endian(column)
+
+        names = str(take(strings_len), "utf-8").split("\0")
+        refs = [account_ref(name or None) for name in names]
+        store._from = array("i", map(refs.__getitem__, local_from))
+        store._to = array("i", map(refs.__getitem__, local_to))
+        if odd_len:
+            odd_ids = json.loads(str(take(odd_len), "utf-8"))
+            store._odd_ids = {int(row): value for row, value in odd_ids.items()}
+        store._sorted = None
+        return store
@@ -1,7 +1,9 @@
-import hashlib
 import datetime
 from typing import List, Optional
 
+import passwords
+from instrumentation import timed
+
 
 class User:
     def __init__(self, user_id: int, full_name: str, phone: str, password: str):
@@ -14,10 +16,12 @@ class User:
         self.login_attempts = 0
         self.locked_until = None
 
+    @timed("user.hash_password")
     def _hash_password(self, password: str) -> str:
-        """Create a SHA-256 hash of the password"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Create a salted KDF hash of the password"""
+        return passwords.hash_password(password)
 
+    @timed("user.authenticate")
     def authenticate(self, password: str) -> bool:
         """Verify user password"""
         # Check if account is locked
@@ -29,8 +33,11 @@ class User:
             return False
 
         # Compare hashed password
-        if self._hash_password(password) == self.password:
+        if passwords.verify_password(password, self.password):
             self.login_attempts = 0
+            # Upgrade legacy SHA-256 and outdated KDF hashes transparently
+            if passwords.needs_rehash(self.password):
+                self.password = self._hash_password(password)
             return True
         else:
             self.login_attempts += 1
@@ -77,12 +84,11 @@ class User:
     @classmethod
     def from_dict(cls, data: dict) -> "User":
         """Create User object from dictionary"""
-        user = cls(
-            user_id=data["user_id"],
-            full_name=data["full_name"],
-            phone=data["phone"],
-            password="",  # Temporary placeholder
-        )
+        # Skip __init__ so loading never runs the KDF
+        user = cls.__new__(cls)
+        user.user_id = data["user_id"]
+        user.full_name = data["full_name"]
+        user.phone = data["phone"]
         # Directly set the hashed password
         user.password = data["password"]
         user.accounts = data["accounts"]
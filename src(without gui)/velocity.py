@@ -0,0 +1,193 @@
+import datetime
+import json
+import threading
+import weakref
+from collections import deque
+from typing import Iterable, List, Optional, Sequence
+
+from transaction_store import to_micros
+
+OUTGOING = ("withdraw", "transfer")
+
+
+class Rule:
+    """At most max_count operations or max_amount in total per window seconds.
+
+    Only outgoing operations are limited, so kinds must be drawn from
+    OUTGOING; a deposit rule would never be checked.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: float,
+        max_count: Optional[int] = None,
+        max_amount: Optional[float] = None,
+        kinds: Sequence[str] = OUTGOING,
+        currency: Optional[str] = None,
+    ):
+        self.name = name
+        self.window = window
+        self.max_count = max_count
+        self.max_amount = max_amount
+        unknown = set(kinds) - set(OUTGOING)
+        if unknown:
+            raise ValueError(
+                f"Rule {name!r} limits unsupported kinds: {sorted(unknown)}"
+            )
+        self.kinds = tuple(kinds)
+        self.currency = currency
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Rule":
+        return cls(
+            data["name"],
+            data["window"],
+            data.get("max_count"),
+            data.get("max_amount"),
+            data.get("kinds", OUTGOING),
+            data.get("currency"),
+        )
+
+    def applies(self, kind: str, currency: str) -> bool:
+        return kind in self.kinds and self.currency in (None, currency)
+
+
+class _Window:
+    """Count and sum of one account's operations inside one rule's window"""
+
+    __slots__ = ("span", "events", "total")
+
+    def __init__(self, span: int):
+        self.span = span
+        self.events = deque()  # (stamp in microseconds, amount), oldest first
+        self.total = 0.0
+
+    def add(self, stamp: int, amount: float) -> None:
+        self.events.append((stamp, amount))
+        self.total += amount
+
+    def expire(self, now: int) -> None:
+        """Drop events that have slid out of the window"""
+        events = self.events
+        cutoff = now - self.span
+        while events and events[0][0] <= cutoff:
+            self.total -= events.popleft()[1]
+        if not events:
+            self.total = 0.0  # no float drift from an empty window
+
+
+class VelocityRules:
+    """Sliding-window limits checked in O(1) amortized per operation.
+
+    Each account gets one window per rule, built from its recent history
+    the first time the account is checked and then updated as operations
+    are recorded. Windows are keyed by account object, so an account that
+    is evicted and decoded again simply rebuilds them.
+    """
+
+    def __init__(self, rules: Iterable[Rule]):
+        self.rules: List[Rule] = list(rules)
+        self._longest = max((rule.window for rule in self.rules), default=0)
+        self._windows = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _windows_for(self, account) -> List[_Window]:
+        windows = self._windows.get(account)
+        if windows is not None:
+            return windows
+
+        windows = [_Window(int(rule.window * 1_000_000)) for rule in self.rules]
+        store = account.transactions
+        since = datetime.datetime.now() - datetime.timedelta(seconds=self._longest)
+        lo, hi = store.time_range(since)
+        for transaction in store.in_time_order(lo, hi):
+            if transaction.type == "transfer" and (
+                transaction.from_account != account.account_number
+            ):
+                continue
+            stamp = to_micros(transaction.timestamp)
+            for rule, window in zip(self.rules, windows):
+                if rule.applies(transaction.type, account.currency):
+                    window.add(stamp, transaction.amount)
+        with self._lock:
+            return self._windows.setdefault(account, windows)
+
+    def violation(
+        self,
+        account,
+        kind: str,
+        amount: float,
+        pending_count: int = 0,
+        pending_amount: float = 0.0,
+    ) -> Optional[str]:
+        """Name of the first rule the operation would break, else None.
+
+        pending_count and pending_amount cover operations that are planned
+        but not yet recorded, such as earlier lines of a batch.
+        """
+        now = to_micros(datetime.datetime.now())
+        for rule, window in zip(self.rules, self._windows_for(account)):
+            if not rule.applies(kind, account.currency):
+                continue
+            window.expire(now)
+            if rule.max_count is not None and (
+                len(window.events) + pending_count + 1 > rule.max_count
+            ):
+                return rule.name
+            if rule.max_amount is not None and (
+                window.total + pending_amount + amount > rule.max_amount
+            ):
+                return rule.name
+        return None
+
+    def record(
+        self, account, kind: str, amount: float, when: datetime.datetime
+    ) -> None:
+        """Count an operation that was just applied"""
+        stamp = to_micros(when)
+        for rule, window in zip(self.rules, self._windows_for(account)):
+            if rule.applies(kind, account.currency):
+                window.add(stamp, amount)
+
+
+_rules: Optional[VelocityRules] = None
+
+
+def configure(rules: Iterable[Rule]) -> None:
+    """Enforce these rules on every account from now on"""
+    global _rules
+    _rules = VelocityRules(rules)
+
+
+def disable() -> None:
+    global _rules
+    _rules = None
+
+
+def is_enabled() -> bool:
+    return _rules is not None
+
+
+def load_rules(path: str) -> List[Rule]:
+    """Rules from a JSON list of Rule.from_dict objects"""
+    with open(path) as file:
+        return [Rule.from_dict(data) for data in json.load(file)]
+
+
+def check(
+    account,
+    kind: str,
+    amount: float,
+    pending_count: int = 0,
+    pending_amount: float = 0.0,
+) -> Optional[str]:
+    """Name of the rule an outgoing operation would break; None if allowed"""
+    if _rules is None:
+        return None
+    return _rules.violation(account, kind, amount, pending_count, pending_amount)
+
+
+def record(account, kind: str, amount: float, when: datetime.datetime) -> None:
+    if _rules is not None:
+        _rules.record(account, kind, amount, when)
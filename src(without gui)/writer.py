@@ -0,0 +1,126 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class GroupCommitWriter:
+    """Runs commit() on a background thread for groups of changes.
+
+    Callers report each change with mark_dirty(). The writer commits once
+    commit_interval seconds have passed since the first uncommitted change,
+    as soon as commit_threshold changes are pending, or when someone waits
+    for durability with flush() or wait_durable().
+    """
+
+    def __init__(
+        self,
+        commit: Callable[[], None],
+        commit_interval: float = 1.0,
+        commit_threshold: int = 100,
+    ):
+        self._commit = commit
+        self.commit_interval = commit_interval
+        self.commit_threshold = commit_threshold
+        self._cond = threading.Condition()
+        self._dirty = 0  # generation of the latest change
+        self._durable = 0  # generation of the latest committed change
+        self._requested = 0  # generation someone is waiting for
+        self._closing = False
+        self._error: Optional[Exception] = None
+        self._thread = threading.Thread(
+            target=self._run, name="bank-writer", daemon=True
+        )
+        self._thread.start()
+
+    def mark_dirty(self) -> int:
+        """Record one change; return its generation for wait_durable()"""
+        with self._cond:
+            self._dirty += 1
+            pending = self._dirty - self._durable
+            # Wake the writer to start the interval, or to commit right away
+            if pending == 1 or pending >= self.commit_threshold:
+                self._cond.notify_all()
+            return self._dirty
+
+    def pending(self) -> int:
+        """Number of changes not yet committed"""
+        with self._cond:
+            return self._dirty - self._durable
+
+    def wait_durable(self, generation: Optional[int] = None) -> None:
+        """Commit now if needed and block until generation is on disk"""
+        with self._cond:
+            target = self._dirty if generation is None else generation
+            if self._durable >= target:
+                return
+            self._requested = max(self._requested, target)
+            self._cond.notify_all()
+            while self._durable < target:
+                if self._error is not None:
+                    raise self._error
+                if not self._thread.is_alive():
+                    raise RuntimeError("Writer is closed")
+                self._cond.wait()
+
+    def flush(self) -> None:
+        """Block until every change reported so far is on disk"""
+        self.wait_durable()
+
+    def close(self) -> None:
+        """Commit whatever is pending and stop the thread.
+
+        Raises the commit's error if the last changes could not be saved.
+        """
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        with self._cond:
+            if self._error is not None and self._durable < self._dirty:
+                raise self._error
+
+    def _due(self, deadline: float) -> bool:
+        pending = self._dirty - self._durable
+        return pending > 0 and (
+            self._closing
+            or self._requested > self._durable
+            or pending >= self.commit_threshold
+            or time.monotonic() >= deadline
+        )
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                deadline = None
+                while True:
+                    if self._dirty == self._durable:
+                        if self._closing:
+                            return
+                        deadline = None
+                        self._cond.wait()
+                        continue
+                    if deadline is None:
+                        deadline = time.monotonic() + self.commit_interval
+                    if self._due(deadline):
+                        break
+                    self._cond.wait(max(0.0, deadline - time.monotonic()))
+                # Every change up to here is applied, so the commit covers it
+                target = self._dirty
+
+            try:
+                self._commit()
+            except Exception as e:
+                print(f"Error saving data: {e}")
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                    if self._closing:
+                        return
+                # Retry on the next interval rather than spinning
+                time.sleep(self.commit_interval)
+                continue
+
+            with self._cond:
+                self._durable = target
+                self._error = None
+                self._cond.notify_all()